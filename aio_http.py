@@ -0,0 +1,114 @@
+"""
+Shared, tuned aiohttp connection pool for the MCP servers
+"""
+import os
+import time
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class AsyncHTTPPool:
+    """One aiohttp.ClientSession with a configured TCPConnector.
+
+    Connections to graph.facebook.com are kept alive and capped per host,
+    DNS answers are cached, and every request has connect/read/total
+    timeouts. Trace hooks count requests and connection reuse for
+    diagnostics. aiohttp itself is imported on first use, so a server
+    answers `initialize` without paying for it.
+    """
+
+    def __init__(self):
+        self.limit = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+        self.limit_per_host = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+        self.dns_cache_ttl = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+        self.keepalive_timeout = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+        self.connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '20'))
+        self.total_timeout = float(os.getenv('HTTP_TOTAL_TIMEOUT', '60'))
+        self.session: Optional['aiohttp.ClientSession'] = None
+        self._created_at: Optional[float] = None
+        self._counters = self._new_counters()
+
+    @staticmethod
+    def _new_counters() -> Dict[str, int]:
+        return {
+            'requests': 0,
+            'in_flight': 0,
+            'errors': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0
+        }
+
+    def timeout(self, total: Optional[float] = None) -> 'aiohttp.ClientTimeout':
+        """Timeouts for one request; `total` (e.g. a deadline's remaining time) caps all of them"""
+        import aiohttp
+        total = min(total, self.total_timeout) if total else self.total_timeout
+        return aiohttp.ClientTimeout(
+            total=total,
+            sock_connect=min(self.connect_timeout, total),
+            sock_read=min(self.read_timeout, total)
+        )
+
+    def _trace_config(self) -> 'aiohttp.TraceConfig':
+        import aiohttp
+        counters = self._counters
+
+        def count(name, delta=1):
+            async def hook(session, context, params):
+                counters[name] += delta
+            return hook
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(count('requests'))
+        trace.on_request_start.append(count('in_flight'))
+        trace.on_request_end.append(count('in_flight', -1))
+        trace.on_request_exception.append(count('in_flight', -1))
+        trace.on_request_exception.append(count('errors'))
+        trace.on_connection_create_end.append(count('connections_created'))
+        trace.on_connection_reuseconn.append(count('connections_reused'))
+        trace.on_dns_cache_hit.append(count('dns_cache_hits'))
+        trace.on_dns_cache_miss.append(count('dns_cache_misses'))
+        return trace
+
+    async def get_session(self) -> 'aiohttp.ClientSession':
+        """Return the shared session, creating it (inside the running loop) on first use"""
+        if self.session is None or self.session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout(),
+                trace_configs=[self._trace_config()]
+            )
+            self._created_at = time.time()
+            logging.info(f"aiohttp pool created (limit={self.limit}, per_host={self.limit_per_host})")
+        return self.session
+
+    async def close(self):
+        """Close the session and its pooled connections"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def metrics(self) -> Dict[str, Any]:
+        reuse_base = self._counters['connections_created'] + self._counters['connections_reused']
+        return dict(
+            self._counters,
+            open=self.session is not None and not self.session.closed,
+            open_since=self._created_at if self.session is not None else None,
+            connection_reuse_ratio=round(self._counters['connections_reused'] / reuse_base, 3) if reuse_base else None,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            dns_cache_ttl=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
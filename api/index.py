@@ -5,15 +5,18 @@ Optimized for Vercel's serverless environment
 """
 
 import os
-import requests
+import sys
 import json
 from flask import Flask, render_template, request, flash, redirect, url_for, jsonify
 
+# Shared modules live in the project root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from http_client import http_client
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'meta-content-manager-secret-key')
 
 # Configure template and static folders for Vercel
-import os
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'templates'))
 static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
 app.template_folder = template_dir
@@ -35,7 +38,7 @@ class MetaAPI:
             data = None
         
         try:
-            response = requests.request(method, url, params=params, data=data, timeout=25)
+            response = http_client.request(method, url, params=params, data=data)
             result = response.json()
             if response.status_code >= 400:
                 raise Exception(f"Meta API Error: {result.get('error', {}).get('message', 'Unknown error')}")
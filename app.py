@@ -4,45 +4,229 @@ Meta Content Manager - Simplified for Vercel
 """
 
 import os
-import requests
-from flask import Flask, render_template, request, flash, redirect, url_for, jsonify, session
+import time
+import sqlite3
+import logging
+import contextvars
+import concurrent.futures
+from flask import (Flask, Response, render_template, request, flash, redirect, url_for, jsonify, session, g,
+                   stream_with_context)
 from openai import OpenAI
 import json
 from supabase_client import supabase_manager
+from http_client import http_client
+from meta_errors import MetaAPIError
+from page_token_cache import PageTokenCache
+from graph_batch import batch_insights
+from graph_paging import iter_edge, merge_insight_series
+from rate_limit import usage_governor, object_id_for
+from publish_jobs import InstagramPublisher, background_loop, JOB_PUBLISHED
+from bulk_publish import publish_many, parse_concurrency, summarize, MAX_BULK_POSTS
+from outbox import get_outbox, prepare_post
+from insights_store import InsightsStore
+from generation_cache import GenerationCache, get_generation_store
+from training_context import TrainingContextCache
+from generation_stream import (GenerationTimer, PostCopyParser, generation_metrics, iter_deltas, parse_post_copy,
+                               sse_event)
+from resilience import (call_with_retry, breakers, breaker_status, start_deadline, end_deadline, remaining_time,
+                        CircuitOpenError, DeadlineExceeded)
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'meta-content-manager-secret-key')
 
-# OpenAI configuration
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# OpenAI configuration - retries are handled by resilience.call_with_retry
+openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+
+# Time budget for a single request; Vercel terminates functions at ~25s
+ROUTE_DEADLINE_SECONDS = float(os.getenv('ROUTE_DEADLINE_SECONDS', '22'))
+
+# Serverless instances freeze once the response is sent, so work can't be left running in the background
+SERVERLESS = bool(os.getenv('VERCEL'))
+
+# DALL-E image URLs expire after an hour. A cached URL must keep enough of that hour to be
+# scheduled or published to Instagram afterwards, so at least 30 minutes are always left.
+DALLE_URL_LIFETIME = 3600
+GENERATION_IMAGE_CACHE_TTL = min(float(os.getenv('GENERATION_IMAGE_CACHE_TTL', '900')), DALLE_URL_LIFETIME / 2)
+
+# Longest create_smart_post waits for training context before writing without it
+SMART_POST_CONTEXT_TIMEOUT = float(os.getenv('SMART_POST_CONTEXT_TIMEOUT', '4'))
+# Seconds of the deadline kept back for returning the copy when the image is late
+SMART_POST_RESPONSE_RESERVE = float(os.getenv('SMART_POST_RESPONSE_RESERVE', '1'))
+
+# Threads for the independent OpenAI/Supabase calls a single request makes at once
+generation_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('GENERATION_WORKERS', '8')), thread_name_prefix='generation'
+)
+
+@app.before_request
+def start_route_deadline():
+    """Give every outbound call in this request a shared deadline"""
+    g.deadline_token = start_deadline(ROUTE_DEADLINE_SECONDS)
+
+@app.teardown_request
+def end_route_deadline(error=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        end_deadline(token)
 
 # Configuration removed: Google Drive OAuth no longer needed with Supabase storage
 
+# Fields read from me/accounts by the page list, publishing and insights routes
+ACCOUNT_FIELDS = 'id,name,access_token,category,tasks'
+
 class MetaAPI:
     def __init__(self):
         self.app_id = os.getenv('META_APP_ID', '1667446050583846')
         self.access_token = os.getenv('META_ACCESS_TOKEN', '')
         self.base_url = 'https://graph.facebook.com/v18.0'
     
-    def make_api_request(self, endpoint: str, method: str = 'GET', data: dict = None) -> dict:
+    def make_api_request(self, endpoint: str, method: str = 'GET', data: dict = None,
+                         access_token: str = None) -> dict:
         """Make a request to Meta Graph API"""
+        try:
+            return call_with_retry(
+                self._send, endpoint, method, data, access_token,
+                breaker=breakers['meta'], idempotent=(method == 'GET'), timeout_arg='timeout'
+            )
+        except (MetaAPIError, CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise Exception(f"Request failed: {str(e)}")
+
+    def _send(self, endpoint: str, method: str, data: dict, access_token: str, timeout: float = None) -> dict:
+        """Send a single Graph API request without retries"""
         url = f"{self.base_url}/{endpoint}"
-        params = {'access_token': self.access_token}
+        params = {'access_token': access_token or self.access_token}
         
         if method == 'GET' and data:
             params.update(data)
             data = None
         
+        object_id = object_id_for(endpoint)
+        usage_governor.wait(object_id)
+        
+        response = http_client.request(method, url, params=params, data=data, timeout=timeout)
+        usage_governor.record(response.headers, object_id)
         try:
-            response = requests.request(method, url, params=params, data=data, timeout=25)
             result = response.json()
-            if response.status_code >= 400:
-                raise Exception(f"Meta API Error: {result.get('error', {}).get('message', 'Unknown error')}")
-            return result
-        except Exception as e:
-            raise Exception(f"Request failed: {str(e)}")
+        except ValueError:
+            if response.status_code < 400:
+                raise
+            # Gateway errors from Meta's edge come back as HTML
+            result = {}
+        
+        if response.status_code >= 400:
+            error = MetaAPIError.from_response(response.status_code, result)
+            if error.is_throttle_error:
+                usage_governor.record_throttle(error, object_id)
+            raise error
+        return result
+
+    def iter_edge(self, endpoint: str, fields: str = None, limit: int = None,
+                  params: dict = None, access_token: str = None):
+        """Lazily yield every row of an edge, following paging cursors"""
+        def request(edge, method, data):
+            return self.make_api_request(edge, method, data, access_token=access_token)
+        return iter_edge(request, endpoint, fields=fields, limit=limit, params=params)
+
+    def get_accounts(self, user_token: str = None) -> list:
+        """Fetch all pages (with page access tokens) managed by a user token"""
+        return list(self.iter_edge("me/accounts", fields=ACCOUNT_FIELDS, limit=100, access_token=user_token))
 
 meta_api = MetaAPI()
+page_token_cache = PageTokenCache(meta_api.get_accounts)
+instagram_publisher = InstagramPublisher(background_loop.wrap_sync(meta_api.make_api_request))
+outbox = None
+
+def get_scheduled_outbox():
+    """Open the scheduled post outbox on first use"""
+    global outbox
+    if outbox is None:
+        outbox = get_outbox()
+    return outbox
+
+insights_store = None
+generation_cache = None
+
+def get_generation_cache():
+    """Create the generation cache (and its persistent store, if configured) on first use"""
+    global generation_cache
+    if generation_cache is None:
+        generation_cache = GenerationCache(store=get_generation_store())
+    return generation_cache
+
+def get_insights_store():
+    """Open the local insights store on first use; None if it can't be opened (e.g. a read-only filesystem)"""
+    global insights_store
+    if insights_store is None:
+        try:
+            insights_store = InsightsStore()
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Insights store unavailable, reading insights live from Graph: {e}")
+            insights_store = False
+    return insights_store or None
+
+def read_insights(object_id, metrics, period, since=None, until=None, access_token=None, refresh=False):
+    """Sync a series incrementally, then serve it from the local insights store (or live when there is none)"""
+    if not metrics:
+        return []
+    def fetch(endpoint, params):
+        return meta_api.iter_edge(endpoint, params=params, access_token=access_token)
+    store = get_insights_store()
+    if store is None:
+        params = {'metric': ','.join(metrics), 'period': period}
+        for key, value in (('since', since), ('until', until)):
+            if value:
+                params[key] = value
+        return merge_insight_series(fetch(f"{object_id}/insights", params))
+    try:
+        store.sync(fetch, object_id, metrics, period, force=refresh)
+    except Exception as e:
+        # Stored history is still worth showing when Meta is unavailable, unreachable or throttling us
+        series = store.series(object_id, metrics, period, since, until)
+        if not series:
+            raise
+        logging.warning(f"Serving stored insights for {object_id}: {e}")
+        return series
+    return store.series(object_id, metrics, period, since, until)
+
+def sync_insights(metrics, period='day', instagram_account_ids=(), instagram_metrics=(), force=False):
+    """Sync insights for every managed page (and the given Instagram accounts)"""
+    store = get_insights_store()
+    if store is None:
+        raise RuntimeError('Insights store is unavailable (set INSIGHTS_DB_PATH to a writable location)')
+    synced, errors = {}, {}
+    targets = [(page.get('id'), page.get('access_token'), metrics)
+               for page in page_token_cache.get_pages(meta_api.access_token)]
+    targets += [(account_id, None, instagram_metrics) for account_id in instagram_account_ids]
+    for object_id, access_token, object_metrics in targets:
+        def fetch(endpoint, params, access_token=access_token):
+            return meta_api.iter_edge(endpoint, params=params, access_token=access_token)
+        try:
+            synced[object_id] = store.sync(fetch, object_id, list(object_metrics), period, force=force)
+        except Exception as e:
+            logging.error(f"Insights sync failed for {object_id}: {e}")
+            errors[object_id] = str(e)
+    return {'synced': synced, 'errors': errors}
+
+def publish_to_page(page_id: str, data: dict) -> dict:
+    """Post to a page's feed with its cached page access token"""
+    # Page access token comes from the cache, so publishing is a single Graph call
+    page_access_token = page_token_cache.get_page_token(meta_api.access_token, page_id)
+    if not page_access_token:
+        raise Exception('Could not find access token for selected page')
+    
+    try:
+        return meta_api.make_api_request(f"{page_id}/feed", "POST", data, access_token=page_access_token)
+    except MetaAPIError as e:
+        if not e.is_token_error:
+            raise
+        # Cached page token was revoked or expired - refetch once and retry
+        page_token_cache.invalidate(meta_api.access_token)
+        page_access_token = page_token_cache.get_page_token(meta_api.access_token, page_id)
+        if not page_access_token:
+            raise
+        return meta_api.make_api_request(f"{page_id}/feed", "POST", data, access_token=page_access_token)
 
 @app.route('/')
 def index():
@@ -54,6 +238,13 @@ def health():
     """Health check"""
     return jsonify({'status': 'ok', 'app': 'Meta Content Manager', 'version': '2.1', 'bulk_upload': 'enabled', 'timestamp': 'July 2025'})
 
+@app.route('/rate-limit-status')
+def rate_limit_status():
+    """Current Meta API usage budgets"""
+    status = usage_governor.snapshot()
+    status['circuit_breakers'] = breaker_status()
+    return jsonify(status)
+
 @app.route('/test')
 def test():
     """Simple test route"""
@@ -97,8 +288,7 @@ def pages():
             flash('Meta access token not configured', 'error')
             return render_template('pages.html', pages=[])
             
-        result = meta_api.make_api_request("me/accounts", "GET")
-        pages_data = result.get("data", [])
+        pages_data = page_token_cache.get_pages(meta_api.access_token)
         return render_template('pages.html', pages=pages_data)
     except Exception as e:
         flash(f"Error fetching pages: {str(e)}", 'error')
@@ -186,74 +376,133 @@ def generate_image():
         # Enhanced prompt for social media
         enhanced_prompt = f"{prompt}, {style} style, high quality, suitable for social media, professional"
         
-        # Generate image using DALL-E
-        response = openai_client.images.generate(
-            model="dall-e-3",
-            prompt=enhanced_prompt,
-            n=1,
-            size="1024x1024",
-            response_format="url"
-        )
-        
-        image_url = response.data[0].url
+        # Generate image using DALL-E (or reuse one made for the same prompt)
+        image_url, cached = cached_image_url(enhanced_prompt, regenerate=request_flag('regenerate'))
         
         return jsonify({
             'success': True,
             'image_url': image_url,
-            'prompt': enhanced_prompt
+            'prompt': enhanced_prompt,
+            'cached': cached
         })
         
     except Exception as e:
         return jsonify({'error': f'Image generation failed: {str(e)}'}), 500
 
-@app.route('/create-smart-post', methods=['POST'])
-def create_smart_post():
-    """Create intelligent social media post with AI"""
+def generate_image_url(prompt: str) -> str:
+    """Generate one DALL-E image and return its URL"""
+    response = call_with_retry(
+        openai_client.images.generate,
+        breaker=breakers['openai'],
+        timeout_arg='timeout',
+        model="dall-e-3",
+        prompt=prompt,
+        n=1,
+        size="1024x1024",
+        response_format="url"
+    )
+    return response.data[0].url
+
+def cached_image_url(prompt: str, regenerate: bool = False) -> tuple:
+    """(image URL, cached) for a DALL-E prompt"""
+    return get_generation_cache().get_or_generate(
+        'image', {'model': "dall-e-3", 'prompt': prompt, 'size': "1024x1024"},
+        lambda: generate_image_url(prompt), bypass=regenerate, ttl=GENERATION_IMAGE_CACHE_TTL
+    )
+
+def cached_completion(namespace: str, completion: dict, regenerate: bool = False) -> tuple:
+    """(completion text, cached) for a chat completion request"""
+    return get_generation_cache().get_or_generate(
+        namespace, completion,
+        lambda: create_chat_completion(**completion).choices[0].message.content,
+        bypass=regenerate
+    )
+
+def submit_generation(func, *args, **kwargs) -> concurrent.futures.Future:
+    """Run a call on the generation pool, keeping this request's deadline"""
+    return generation_executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+def wait_for(future: concurrent.futures.Future, timeout: float = None, reserve: float = 0.0):
+    """Result of a generation future, waiting no longer than `timeout` or the route deadline
+    (less `reserve` seconds kept back for sending the response)"""
+    remaining = remaining_time()
+    if remaining is not None:
+        budget = max(remaining - reserve, 0)
+        timeout = budget if timeout is None else min(timeout, budget)
     try:
-        # Extract form data
-        topic = request.form.get('topic', '').strip()
-        platform = request.form.get('platform', 'both')
-        post_type = request.form.get('post_type', 'general')
-        business_name = request.form.get('business_name', 'your business')
-        target_audience = request.form.get('target_audience', 'fitness enthusiasts')
-        tone = request.form.get('tone', 'motivational')
-        call_to_action = request.form.get('call_to_action', '')
-        image_style = request.form.get('image_style', 'realistic')
-        generate_image = request.form.get('generate_image') == 'on'
-        
-        if not topic:
-            return jsonify({'error': 'Topic is required'}), 400
-        
-        if not openai_client.api_key:
-            return jsonify({'error': 'OpenAI API key not configured'}), 400
-        
-        # Get training context for personalization from Supabase or fallback
-        if supabase_manager.is_available():
-            training_context_data = supabase_manager.get_training_context()
-            profile = training_context_data.get('business_profile', {})
-            content_examples = training_context_data.get('content_examples', [])[-3:]  # Last 3 posts
-        else:
-            profile = fallback_training_data.get('business_profile', {})
-            content_examples = fallback_training_data.get('content_library', [])[-3:]  # Last 3 posts
-        
-        # Build enhanced prompt with training data
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise DeadlineExceeded("Did not finish in time") from None
+
+def load_training_data(business_id: str = None) -> tuple:
+    """Business profile, the last 3 content examples and all knowledge items, from Supabase or the fallback store.
+
+    Query errors are raised rather than read as empty data, so a failed load
+    keeps serving the previous context instead of caching an empty one."""
+    if supabase_manager.is_available():
+        return (supabase_manager.get_business_profile(business_id, strict=True),
+                supabase_manager.get_content_library(business_id, limit=5, strict=True)[-3:],
+                supabase_manager.get_claude_knowledge(business_id=business_id, strict=True))
+    return (fallback_training_data.get('business_profile', {}),
+            fallback_training_data.get('content_library', [])[-3:],
+            list(fallback_training_data.get('claude_knowledge', [])))
+
+# Compiled prompt context; the save routes bump its version when the training data changes
+training_contexts = TrainingContextCache(load_training_data)
+
+def request_flag(name: str) -> bool:
+    """A boolean option sent as a form/query field or in the JSON body"""
+    flag = request.values.get(name) or (request.get_json(silent=True) or {}).get(name)
+    return str(flag).lower() in ('1', 'true', 'on')
+
+def wants_stream() -> bool:
+    """Whether the client asked for a text/event-stream response (stream=1 or the Accept header)"""
+    return request_flag('stream') or request.accept_mimetypes.best == 'text/event-stream'
+
+def event_stream(events) -> Response:
+    """Send a generator of SSE frames without buffering"""
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def create_chat_completion(stream: bool = False, **kwargs):
+    """OpenAI chat completion; with stream=True retries cover opening the stream, not reading it"""
+    return call_with_retry(
+        openai_client.chat.completions.create,
+        breaker=breakers['openai'],
+        timeout_arg='timeout',
+        stream=stream,
+        **kwargs
+    )
+
+def start_smart_post(form, regenerate: bool = False) -> dict:
+    """Kick off the smart post image, load training context and build the copy prompt"""
+    topic = form.get('topic', '').strip()
+    platform = form.get('platform', 'both')
+    post_type = form.get('post_type', 'general')
+    business_name = form.get('business_name', 'your business')
+    target_audience = form.get('target_audience', 'fitness enthusiasts')
+    tone = form.get('tone', 'motivational')
+    call_to_action = form.get('call_to_action', '')
+    image_style = form.get('image_style', 'realistic')
+    generate_image = form.get('generate_image') == 'on'
+    
+    # The image prompt only uses form fields, so DALL-E starts right away and runs
+    # alongside the training context fetch and the copy generation
+    image_prompt = f"{topic}, {image_style} style, {business_name}, fitness, gym, {post_type}, high quality, social media"
+    image_future = submit_generation(cached_image_url, image_prompt, regenerate) if generate_image else None
+    
+    # Get training context for personalization (compiled in memory, so this only waits after
+    # the training data changed); write without it rather than wait too long
+    partial = []
+    try:
+        compiled = wait_for(submit_generation(training_contexts.get), timeout=SMART_POST_CONTEXT_TIMEOUT)
+        training_context = compiled.smart_post_context(business_name, target_audience, tone)
+    except Exception as context_error:
+        logging.warning(f"Smart post continuing without training context: {context_error}")
         training_context = ""
-        if profile:
-            training_context += f"\nBusiness Context:\n"
-            training_context += f"- Business: {profile.get('business_name', business_name)}\n"
-            training_context += f"- Industry: {profile.get('industry', 'fitness')}\n"
-            training_context += f"- Target Audience: {profile.get('target_audience', target_audience)}\n"
-            training_context += f"- Brand Voice: {profile.get('brand_voice', tone)}\n"
-            training_context += f"- Services: {profile.get('services', '')}\n"
-            training_context += f"- USP: {profile.get('usp', '')}\n"
-        
-        if content_examples:
-            training_context += f"\nSuccessful Content Examples:\n"
-            for example in content_examples:
-                training_context += f"- {example.get('post_content', '')[:100]}...\n"
-        
-        # Generate content with OpenAI
-        content_prompt = f"""
+        partial.append('training_context')
+    
+    content_prompt = f"""
         Create a {tone} social media post for {platform} about: {topic}
         
         {training_context}
@@ -276,9 +525,15 @@ def create_smart_post():
         HASHTAGS:
         [Relevant hashtags here]
         """
-        
-        # Generate copy with GPT
-        response = openai_client.chat.completions.create(
+    
+    return {
+        'platform': platform,
+        'post_type': post_type,
+        'image_prompt': image_prompt,
+        'image_future': image_future,
+        'partial': partial,
+        'regenerate': regenerate,
+        'completion': dict(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are an expert social media content creator specializing in fitness and wellness businesses."},
@@ -287,50 +542,121 @@ def create_smart_post():
             max_tokens=500,
             temperature=0.7
         )
+    }
+
+def finish_smart_post_image(post: dict, result: dict):
+    """Add the image (or why it's missing) to a smart post result, waiting at most until the deadline"""
+    try:
+        result['image_url'], _ = wait_for(post['image_future'], reserve=SMART_POST_RESPONSE_RESERVE)
+        result['image_prompt'] = post['image_prompt']
+    except Exception as img_error:
+        logging.warning(f"Image generation failed: {img_error}")
+        result['image_error'] = str(img_error)
+        post['partial'].append('image')
+
+def stream_smart_post(post: dict):
+    """SSE frames for a smart post: copy/hashtags deltas as tokens arrive, the image when
+    it's ready, then a done event with the same fields as the JSON response"""
+    timer = GenerationTimer('create_smart_post', streamed=True)
+    parser = PostCopyParser()
+    image = None
+    cache = get_generation_cache()
+    if post['regenerate']:
+        cache.bypass()
+        cached_text = None
+    else:
+        cached_text = cache.get('smart_post', post['completion'])
+    try:
+        yield sse_event('start', {'platform': post['platform'], 'post_type': post['post_type'],
+                                  'partial': post['partial'], 'cached': cached_text is not None})
+        deltas = [cached_text] if cached_text is not None else iter_deltas(
+            create_chat_completion(stream=True, **post['completion'])
+        )
+        for delta in deltas:
+            timer.first_token()
+            for section, text in parser.feed(delta):
+                yield sse_event(section, {'delta': text})
+            # Send the image as soon as it's done rather than after the copy
+            if post['image_future'] and image is None and post['image_future'].done():
+                image = {}
+                finish_smart_post_image(post, image)
+                yield sse_event('image', image)
+        for section, text in parser.finish():
+            yield sse_event(section, {'delta': text})
+        
+        if cached_text is None:
+            cache.put('smart_post', post['completion'], parser.text, cost=time.perf_counter() - timer.started)
+        
+        copy, hashtags = parser.result()
+        result = {
+            'success': True,
+            'copy': copy,
+            'hashtags': hashtags,
+            'platform': post['platform'],
+            'post_type': post['post_type'],
+            'cached': cached_text is not None
+        }
+        if post['image_future']:
+            # An image already sent mid-stream is reused, so a failure is only recorded once
+            if image is None:
+                image = {}
+                finish_smart_post_image(post, image)
+                yield sse_event('image', image)
+            result.update(image)
+        if post['partial']:
+            result['partial'] = post['partial']
+        if cached_text is None:
+            # Cache hits would skew time-to-first-token, so only real generations are recorded
+            result['timing'] = timer.finish()
+        yield sse_event('done', result)
+    except Exception as e:
+        timer.finish(error=True)
+        yield sse_event('error', {'error': f'Smart post creation failed: {str(e)}'})
+
+@app.route('/create-smart-post', methods=['POST'])
+def create_smart_post():
+    """Create intelligent social media post with AI (add stream=1 for a text/event-stream response)"""
+    try:
+        if not request.form.get('topic', '').strip():
+            return jsonify({'error': 'Topic is required'}), 400
         
-        generated_content = response.choices[0].message.content
+        if not openai_client.api_key:
+            return jsonify({'error': 'OpenAI API key not configured'}), 400
         
-        # Parse the response
-        copy_start = generated_content.find("COPY:") + 5
-        hashtags_start = generated_content.find("HASHTAGS:")
+        # regenerate=1 skips the generation cache (the new result replaces the cached one)
+        post = start_smart_post(request.form, regenerate=request_flag('regenerate'))
+        if wants_stream():
+            return event_stream(stream_smart_post(post))
         
-        if hashtags_start == -1:
-            copy = generated_content[copy_start:].strip()
-            hashtags = ""
-        else:
-            copy = generated_content[copy_start:hashtags_start].strip()
-            hashtags = generated_content[hashtags_start + 9:].strip()
+        # Generate copy with GPT, or reuse the copy generated for an identical prompt
+        timer = GenerationTimer('create_smart_post', streamed=False)
+        try:
+            generated_content, cached = cached_completion('smart_post', post['completion'], post['regenerate'])
+        except Exception:
+            timer.finish(error=True)
+            raise
+        timer.first_token()
+        
+        # Parse the response
+        copy, hashtags = parse_post_copy(generated_content)
         
         result = {
             'success': True,
             'copy': copy,
             'hashtags': hashtags,
-            'platform': platform,
-            'post_type': post_type
+            'platform': post['platform'],
+            'post_type': post['post_type'],
+            'cached': cached
         }
         
-        # Generate image if requested
-        if generate_image:
-            try:
-                # Create image prompt based on the content
-                image_prompt = f"{topic}, {image_style} style, {business_name}, fitness, gym, {post_type}, high quality, social media"
-                
-                image_response = openai_client.images.generate(
-                    model="dall-e-3",
-                    prompt=image_prompt,
-                    n=1,
-                    size="1024x1024",
-                    response_format="url"
-                )
-                
-                result['image_url'] = image_response.data[0].url
-                result['image_prompt'] = image_prompt
-                
-            except Exception as img_error:
-                print(f"Image generation failed: {img_error}")
-                # Continue without image
-                pass
+        # Wait for the image with whatever is left of the deadline; the copy is returned either way
+        if post['image_future']:
+            finish_smart_post_image(post, result)
         
+        if post['partial']:
+            result['partial'] = post['partial']
+        if not cached:
+            result['timing'] = timer.finish()
         return jsonify(result)
         
     except Exception as e:
@@ -365,10 +691,12 @@ def save_business_profile():
         if supabase_manager.is_available():
             business_id = supabase_manager.save_business_profile(profile)
             if business_id:
+                training_contexts.bump()
                 return jsonify({'success': True, 'message': 'Business profile saved successfully', 'business_id': business_id})
         
         # Fallback to in-memory storage
         fallback_training_data['business_profile'] = profile
+        training_contexts.bump()
         return jsonify({'success': True, 'message': 'Business profile saved successfully (fallback storage)'})
         
     except Exception as e:
@@ -388,12 +716,14 @@ def save_content():
         if supabase_manager.is_available():
             content_id = supabase_manager.save_content(content)
             if content_id:
+                training_contexts.bump()
                 return jsonify({'success': True, 'message': 'Content added to library', 'content_id': content_id})
         
         # Fallback to in-memory storage
         content['id'] = len(fallback_training_data['content_library']) + 1
         content['timestamp'] = request.form.get('timestamp', '')
         fallback_training_data['content_library'].append(content)
+        training_contexts.bump()
         
         return jsonify({'success': True, 'message': 'Content added to library (fallback storage)'})
         
@@ -559,7 +889,7 @@ def auto_categorize_knowledge():
         """
         
         if openai_client.api_key:
-            response = openai_client.chat.completions.create(
+            completion = dict(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are an expert business analyst. Categorize business information accurately and concisely."},
@@ -568,8 +898,9 @@ def auto_categorize_knowledge():
                 max_tokens=50,
                 temperature=0.1
             )
+            generated_content, cached = cached_completion('categorize', completion, request_flag('regenerate'))
             
-            category = response.choices[0].message.content.strip().lower()
+            category = generated_content.strip().lower()
             
             # Validate category is one of our expected ones
             valid_categories = [
@@ -588,7 +919,8 @@ def auto_categorize_knowledge():
             return jsonify({
                 'success': True,
                 'category': category,
-                'category_display': category_display
+                'category_display': category_display,
+                'cached': cached
             })
         else:
             # Fallback categorization based on keywords for gym coaching business
@@ -640,6 +972,7 @@ def save_claude_knowledge():
         if supabase_manager.is_available():
             saved_id = supabase_manager.save_claude_knowledge(knowledge_item)
             if saved_id:
+                training_contexts.add_knowledge(dict(knowledge_item, id=saved_id))
                 return jsonify({'success': True, 'message': 'Knowledge saved successfully', 'id': saved_id})
         
         # Fallback to in-memory storage
@@ -650,6 +983,7 @@ def save_claude_knowledge():
         import uuid
         knowledge_item['id'] = str(uuid.uuid4())
         fallback_training_data['claude_knowledge'].append(knowledge_item)
+        training_contexts.add_knowledge(knowledge_item)
         
         return jsonify({'success': True, 'message': 'Knowledge saved successfully (fallback)', 'id': knowledge_item['id']})
         
@@ -817,9 +1151,11 @@ def answer_claude_test():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+NO_OPENAI_CHAT_REPLY = "I understand you're asking about the business. Unfortunately, I need the OpenAI API key to be configured to provide detailed responses."
+
 @app.route('/chat-with-claude', methods=['POST'])
 def chat_with_claude():
-    """Chat with Claude using business knowledge"""
+    """Chat with Claude using business knowledge (add "stream": true for a text/event-stream response)"""
     try:
         data = request.get_json()
         user_message = data.get('message', '')
@@ -827,29 +1163,17 @@ def chat_with_claude():
         if not user_message:
             return jsonify({'success': False, 'error': 'Message is required'}), 400
         
-        # Get business context
-        business_context = ""
-        if supabase_manager.is_available():
-            context_data = supabase_manager.get_training_context()
-            profile = context_data.get('business_profile', {})
-            knowledge_items = supabase_manager.get_claude_knowledge()
-        else:
-            profile = fallback_training_data.get('business_profile', {})
-            knowledge_items = fallback_training_data.get('claude_knowledge', [])
-        
-        # Build context from business profile
-        if profile:
-            business_context += f"Business: {profile.get('business_name', 'Gym Lead Hub')}\n"
-            business_context += f"Industry: {profile.get('industry', 'Gym Owner Coaching & Marketing')}\n"
-            business_context += f"Services: {profile.get('services', '')}\n"
-            business_context += f"Target Audience: {profile.get('target_audience', '')}\n"
-            business_context += f"Brand Voice: {profile.get('brand_voice', '')}\n"
+        # Business context and knowledge come from the compiled training context
+        try:
+            compiled = training_contexts.get()
+        except Exception as context_error:
+            # No context could be loaded yet; answer without it rather than fail the chat
+            logging.warning(f"Chat continuing without training context: {context_error}")
+            compiled = None
+        business_context = compiled.chat_context if compiled else ""
         
-        # Add relevant knowledge items
-        relevant_knowledge = []
-        for item in knowledge_items:
-            if any(keyword in user_message.lower() for keyword in item.get('title', '').lower().split()):
-                relevant_knowledge.append(item.get('content', ''))
+        # Best-matching knowledge passages (BM25 over title and content, within the token budget)
+        relevant_knowledge = [passage['text'] for passage in compiled.knowledge_index.search(user_message)] if compiled else []
         
         # Create prompt for Claude
         system_prompt = f"""You are Claude, an AI assistant that has been trained specifically about this business. 
@@ -858,35 +1182,77 @@ Business Context:
 {business_context}
 
 Relevant Knowledge:
-{' '.join(relevant_knowledge[:3])}
+{' '.join(relevant_knowledge)}
 
 Respond as if you are well-informed about this business. Be helpful, accurate, and match the brand voice when possible."""
         
+        completion = dict(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            max_tokens=300,
+            temperature=0.7
+        )
+        context_used = len(relevant_knowledge) > 0
+        
+        if wants_stream():
+            return event_stream(stream_chat_reply(completion, context_used))
+        
         # Generate response using OpenAI (simulating Claude)
         if openai_client.api_key:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
+            timer = GenerationTimer('chat_with_claude', streamed=False)
+            try:
+                response = create_chat_completion(**completion)
+            except Exception:
+                timer.finish(error=True)
+                raise
+            timer.first_token()
+            timer.finish()
             
             claude_response = response.choices[0].message.content
         else:
-            claude_response = "I understand you're asking about the business. Unfortunately, I need the OpenAI API key to be configured to provide detailed responses."
+            claude_response = NO_OPENAI_CHAT_REPLY
         
         return jsonify({
             'success': True,
             'response': claude_response,
-            'context_used': len(relevant_knowledge) > 0
+            'context_used': context_used
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def stream_chat_reply(completion: dict, context_used: bool):
+    """SSE frames for a chat reply: a token event per delta, then done with the full reply"""
+    if not openai_client.api_key:
+        yield sse_event('token', {'delta': NO_OPENAI_CHAT_REPLY})
+        yield sse_event('done', {'success': True, 'response': NO_OPENAI_CHAT_REPLY, 'context_used': context_used})
+        return
+    
+    timer = GenerationTimer('chat_with_claude', streamed=True)
+    reply = ''
+    try:
+        for delta in iter_deltas(create_chat_completion(stream=True, **completion)):
+            timer.first_token()
+            reply += delta
+            yield sse_event('token', {'delta': delta})
+        yield sse_event('done', {'success': True, 'response': reply, 'context_used': context_used,
+                                 'timing': timer.finish()})
+    except Exception as e:
+        timer.finish(error=True)
+        yield sse_event('error', {'success': False, 'error': str(e)})
+
+@app.route('/generation-metrics')
+def generation_metrics_status():
+    """Time-to-first-token and total latency of the OpenAI-backed routes, and generation cache hit rates"""
+    return jsonify({
+        'routes': generation_metrics.snapshot(),
+        'cache': get_generation_cache().stats(),
+        'training_context': training_contexts.stats()
+    })
+
 @app.route('/get-claude-knowledge')
 def get_claude_knowledge():
     """Get all Claude knowledge items"""
@@ -930,8 +1296,7 @@ def post_facebook():
                 flash('Meta access token not configured', 'error')
                 return render_template('post_facebook.html', pages=[])
                 
-            result = meta_api.make_api_request("me/accounts", "GET")
-            pages_data = result.get("data", [])
+            pages_data = page_token_cache.get_pages(meta_api.access_token)
             return render_template('post_facebook.html', pages=pages_data)
         except Exception as e:
             flash(f"Error fetching pages: {str(e)}", 'error')
@@ -946,32 +1311,11 @@ def post_facebook():
         return redirect(url_for('post_facebook'))
     
     try:
-        # First get the page access token
-        result = meta_api.make_api_request("me/accounts", "GET")
-        pages_data = result.get("data", [])
-        
-        page_access_token = None
-        for page in pages_data:
-            if page.get("id") == page_id:
-                page_access_token = page.get("access_token")
-                break
-        
-        if not page_access_token:
-            flash('Could not find access token for selected page', 'error')
-            return redirect(url_for('post_facebook'))
-        
-        # Use page access token for posting
-        url = f"{meta_api.base_url}/{page_id}/feed"
-        params = {'access_token': page_access_token}
         data = {"message": message}
         if link:
             data["link"] = link
         
-        response = requests.post(url, params=params, data=data, timeout=25)
-        result = response.json()
-        
-        if response.status_code >= 400:
-            raise Exception(f"Meta API Error: {result.get('error', {}).get('message', 'Unknown error')}")
+        result = publish_to_page(page_id, data)
         
         flash(f"Posted to Facebook! ID: {result.get('id', 'Unknown')}", 'success')
         return redirect(url_for('index'))
@@ -987,35 +1331,118 @@ def post_instagram():
     
     instagram_account_id = request.form.get('instagram_account_id', '').strip()
     image_url = request.form.get('image_url', '').strip()
+    video_url = request.form.get('video_url', '').strip()
     caption = request.form.get('caption', '').strip()
     
-    if not instagram_account_id or not image_url:
+    if not instagram_account_id or not (image_url or video_url):
         flash('Instagram account ID and image URL required', 'error')
         return redirect(url_for('post_instagram'))
     
     try:
-        container_data = {
-            "image_url": image_url,
-            "caption": caption
-        }
-        
-        container_result = meta_api.make_api_request(
-            f"{instagram_account_id}/media", "POST", container_data
+        job = instagram_publisher.create_job(
+            instagram_account_id, image_url=image_url or None, caption=caption, video_url=video_url or None
         )
-        
-        creation_id = container_result.get("id")
-        
-        publish_data = {"creation_id": creation_id}
-        publish_result = meta_api.make_api_request(
-            f"{instagram_account_id}/media_publish", "POST", publish_data
-        )
-        
-        flash(f"Posted to Instagram! ID: {publish_result.get('id', 'Unknown')}", 'success')
+        future = background_loop.submit(instagram_publisher.run_job(job))
+        
+        if SERVERLESS:
+            # Publish within the request; a queued job would be frozen with the instance
+            job = future.result(timeout=remaining_time())
+            if job['status'] != JOB_PUBLISHED:
+                raise Exception(job.get('error') or job['status'])
+            flash(f"Posted to Instagram! ID: {job.get('media_id', 'Unknown')}", 'success')
+            return redirect(url_for('index'))
+        
+        # Container processing and publishing continue in the background
+        flash(f"Instagram post queued! Job ID: {job['id']} (status at /publish-jobs/{job['id']})", 'success')
         return redirect(url_for('index'))
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        flash('Instagram is still processing the media; use scheduled posts for videos on Vercel', 'error')
+        return redirect(url_for('post_instagram'))
     except Exception as e:
         flash(f"Error posting to Instagram: {str(e)}", 'error')
         return redirect(url_for('post_instagram'))
 
+@app.route('/bulk-publish', methods=['POST'])
+def bulk_publish():
+    """Publish a list of Facebook/Instagram posts concurrently"""
+    try:
+        data = request.get_json() or {}
+        posts = data.get('posts', [])
+        
+        if not isinstance(posts, list) or not posts:
+            return jsonify({'error': 'posts must be a non-empty list'}), 400
+        if len(posts) > MAX_BULK_POSTS:
+            return jsonify({'error': f'At most {MAX_BULK_POSTS} posts per request'}), 400
+        if not meta_api.access_token:
+            return jsonify({'error': 'Meta access token not configured'}), 400
+        try:
+            concurrency = parse_concurrency(data.get('concurrency'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Instagram items are returned as queued jobs (except on Vercel); poll /publish-jobs/<id> for the outcome
+        future = background_loop.submit(publish_many(
+            posts,
+            background_loop.wrap_sync(publish_to_page),
+            instagram_publisher,
+            concurrency=concurrency,
+            wait_for_instagram=SERVERLESS
+        ))
+        results = future.result(timeout=remaining_time())
+        return jsonify(summarize(results))
+    except concurrent.futures.TimeoutError:
+        return jsonify({'error': 'Bulk publish is still running; check the pages before retrying'}), 504
+    except Exception as e:
+        return jsonify({'error': f'Bulk publish failed: {str(e)}'}), 500
+
+@app.route('/publish-jobs')
+def list_publish_jobs():
+    """List Instagram publish jobs, newest first"""
+    return jsonify({'jobs': instagram_publisher.list_jobs()})
+
+@app.route('/publish-jobs/<job_id>')
+def publish_job_status(job_id):
+    """Get the status of an Instagram publish job"""
+    job = instagram_publisher.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Publish job not found'}), 404
+    return jsonify(job)
+
+@app.route('/scheduled-posts', methods=['GET', 'POST'])
+def scheduled_posts():
+    """List scheduled posts, or add posts for outbox_worker.py to publish"""
+    try:
+        if request.method == 'GET':
+            posts = get_scheduled_outbox().list_posts(
+                status=request.args.get('status'),
+                limit=min(int(request.args.get('limit', 100)), 500)
+            )
+            return jsonify({'posts': posts})
+        
+        data = request.get_json() or {}
+        posts = data.get('posts') if 'posts' in data else [data]
+        if not isinstance(posts, list) or not posts:
+            return jsonify({'error': 'posts must be a non-empty list'}), 400
+        if len(posts) > MAX_BULK_POSTS:
+            return jsonify({'error': f'At most {MAX_BULK_POSTS} posts per request'}), 400
+        if len(posts) == 1 and isinstance(posts[0], dict) and request.headers.get('Idempotency-Key'):
+            posts[0].setdefault('idempotency_key', request.headers['Idempotency-Key'])
+        
+        # Validate everything first so a bad entry doesn't leave half a calendar queued
+        for index, spec in enumerate(posts):
+            if not isinstance(spec, dict):
+                return jsonify({'error': f'Post {index}: post spec must be an object'}), 400
+            try:
+                prepare_post(spec)
+            except ValueError as e:
+                return jsonify({'error': f'Post {index}: {str(e)}'}), 400
+        
+        queued = [get_scheduled_outbox().enqueue(spec) for spec in posts]
+        return jsonify({'posts': queued}), 201
+    except Exception as e:
+        return jsonify({'error': f'Scheduling failed: {str(e)}'}), 500
+
 @app.route('/analytics')
 def analytics():
     """Analytics dashboard"""
@@ -1032,21 +1459,65 @@ def facebook_insights():
         if not page_id:
             return jsonify({'error': 'Page ID required'}), 400
         
-        params = {"metric": metric, "period": period}
-        result = meta_api.make_api_request(f"{page_id}/insights", "GET", params)
+        metrics = [m.strip() for m in metric.split(',') if m.strip()]
+        series_list = read_insights(
+            page_id, metrics, period, since=request.form.get('since'), until=request.form.get('until'),
+            refresh=request.form.get('refresh') == 'true'
+        )
         
         insights = []
-        for data_point in result.get("data", []):
+        for series in series_list:
             insights.append({
-                'name': data_point.get('name', 'Unknown'),
-                'value': data_point.get('values', [{}])[0].get('value', 'N/A'),
-                'period': data_point.get('period', 'Unknown')
+                'name': series['name'],
+                'value': (series['values'] or [{}])[-1].get('value', 'N/A'),
+                'period': series['period'],
+                'values': series['values']
             })
         
         return jsonify({'insights': insights})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/facebook-insights-all', methods=['GET', 'POST'])
+def facebook_insights_all():
+    """Get Facebook insights for every managed page in one batched request"""
+    try:
+        if not meta_api.access_token:
+            return jsonify({'error': 'Meta access token not configured'}), 400
+        
+        metrics = [m.strip() for m in request.values.get('metric', 'page_views').split(',') if m.strip()]
+        period = request.values.get('period', 'day')
+        
+        pages_data = page_token_cache.get_pages(meta_api.access_token)
+        targets = [(page.get('id'), page.get('access_token')) for page in pages_data]
+        results = batch_insights(meta_api, targets, metrics, period)
+        
+        for page in pages_data:
+            results[page.get('id')]['name'] = page.get('name', 'Unknown')
+        
+        return jsonify({'pages': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/insights-sync', methods=['POST'])
+def insights_sync():
+    """Pull new insights for every managed page into the local store"""
+    try:
+        if not meta_api.access_token:
+            return jsonify({'error': 'Meta access token not configured'}), 400
+        
+        metrics = [m.strip() for m in request.values.get('metric', 'page_views').split(',') if m.strip()]
+        instagram_metrics = [m.strip() for m in request.values.get('instagram_metric', 'impressions').split(',') if m.strip()]
+        instagram_account_ids = [a.strip() for a in request.values.get('instagram_account_id', '').split(',') if a.strip()]
+        
+        result = sync_insights(
+            metrics, request.values.get('period', 'day'), instagram_account_ids=instagram_account_ids,
+            instagram_metrics=instagram_metrics, force=request.values.get('force') == 'true'
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/instagram-insights', methods=['POST'])
 def instagram_insights():
     """Get Instagram insights"""
@@ -1057,14 +1528,19 @@ def instagram_insights():
         if not instagram_account_id:
             return jsonify({'error': 'Instagram account ID required'}), 400
         
-        params = {"metric": metric}
-        result = meta_api.make_api_request(f"{instagram_account_id}/insights", "GET", params)
+        metrics = [m.strip() for m in metric.split(',') if m.strip()]
+        series_list = read_insights(
+            instagram_account_id, metrics, request.form.get('period', 'day'),
+            since=request.form.get('since'), until=request.form.get('until'),
+            refresh=request.form.get('refresh') == 'true'
+        )
         
         insights = []
-        for data_point in result.get("data", []):
+        for series in series_list:
             insights.append({
-                'name': data_point.get('name', 'Unknown'),
-                'value': data_point.get('values', [{}])[0].get('value', 'N/A')
+                'name': series['name'],
+                'value': (series['values'] or [{}])[-1].get('value', 'N/A'),
+                'values': series['values']
             })
         
         return jsonify({'insights': insights})
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat knowledge retrieval: the old per-message title keyword scan
+against the BM25 KnowledgeIndex, over a synthetic knowledge base
+
+Usage:
+    python bench_knowledge.py [--items 10000] [--queries 200]
+    python bench_knowledge.py --check    # exit 1 if the median search is over budget
+
+The search budget can be overridden with KNOWLEDGE_SEARCH_BUDGET_MS.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from knowledge_index import KnowledgeIndex
+
+# Median search latency budget (ms) used by --check
+SEARCH_BUDGET_MS = float(os.getenv('KNOWLEDGE_SEARCH_BUDGET_MS', '20'))
+
+CATEGORIES = ['pricing', 'programs', 'coaching', 'nutrition', 'marketing', 'retention', 'sales', 'community']
+TOPICS = ['membership', 'personal', 'training', 'class', 'schedule', 'trial', 'offer', 'referral', 'challenge',
+          'transformation', 'strength', 'cardio', 'mobility', 'recovery', 'macro', 'meal', 'lead', 'funnel',
+          'instagram', 'facebook', 'review', 'testimonial', 'onboarding', 'cancellation', 'upgrade', 'family',
+          'corporate', 'student', 'weekend', 'morning', 'evening', 'beginner', 'advanced', 'competition']
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tas', 'vo', 'pel', 'din', 'sor', 'qua', 'bri', 'nex', 'tul', 'gam', 'hep']
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    words = set(TOPICS)
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_items(count: int, rng: random.Random) -> list:
+    """Items whose words follow a Zipf-like distribution, roughly like real prose"""
+    vocabulary = make_vocabulary(5000, rng)
+    rng.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    items = []
+    for i in range(count):
+        title_words = rng.sample(TOPICS, 3)
+        words = rng.choices(vocabulary, weights=weights, k=rng.randint(40, 260)) + title_words
+        rng.shuffle(words)
+        items.append({
+            'id': f'k{i}',
+            'category': rng.choice(CATEGORIES),
+            'title': ' '.join(title_words).title() + f' {rng.choice(CATEGORIES)} notes',
+            'content': ' '.join(words) + '.'
+        })
+    return items
+
+
+def make_queries(count: int, rng: random.Random) -> list:
+    templates = ['How much is {} {}?', 'What do we offer for {} and {}?', 'Write a post about our {} {} results',
+                 'Do we have a {} option for {} members?']
+    return [rng.choice(templates).format(*rng.sample(TOPICS, 2)) for _ in range(count)]
+
+
+def keyword_scan(items: list, message: str) -> list:
+    """The previous chat retrieval: first three items with any title word in the message"""
+    relevant = []
+    for item in items:
+        if any(keyword in message.lower() for keyword in item.get('title', '').lower().split()):
+            relevant.append(item.get('content', ''))
+    return relevant[:3]
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def summarize(samples: list) -> str:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"median {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--check', action='store_true', help='exit 1 if the median search is over budget')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = make_items(args.items, rng)
+    queries = make_queries(args.queries, rng)
+
+    started = time.perf_counter()
+    index = KnowledgeIndex(items)
+    build_ms = (time.perf_counter() - started) * 1000
+    stats = index.stats()
+    print(f"{args.items} items -> {stats['passages']} passages, {stats['terms']} terms; build {build_ms:.0f} ms")
+
+    added = make_items(100, random.Random(args.seed + 1))
+    add_samples = []
+    for i, item in enumerate(added):
+        add_samples.append(timed(index.add, dict(item, id=f'new{i}')))
+    print(f"{'incremental add':<16} {summarize(add_samples)}")
+
+    scan_samples = [timed(keyword_scan, items, query) for query in queries]
+    search_samples = [timed(index.search, query) for query in queries]
+    print(f"{'keyword scan':<16} {summarize(scan_samples)}")
+    print(f"{'bm25 search':<16} {summarize(search_samples)}")
+    print(f"speedup x{statistics.median(scan_samples) / statistics.median(search_samples):.1f}")
+
+    if args.check and statistics.median(search_samples) > SEARCH_BUDGET_MS:
+        print(f"FAIL: median search over {SEARCH_BUDGET_MS:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
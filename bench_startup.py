@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark MCP server cold start: time from process spawn to the first
+`initialize` response (and to the `tools/list` response after it)
+
+Usage:
+    python bench_startup.py [--runs 10]
+    python bench_startup.py --check      # exit 1 if a server is over its budget
+
+Budgets can be overridden with STARTUP_BUDGET_SIMPLE_MS / STARTUP_BUDGET_SERVER_MS.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+               "clientInfo": {"name": "bench_startup", "version": "0"}}
+}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+TOOLS_LIST = {"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}}
+
+# Median time-to-initialize budgets (ms) used by --check
+BUDGETS = {
+    'simple_server.py': float(os.getenv('STARTUP_BUDGET_SIMPLE_MS', '400')),
+    'server.py': float(os.getenv('STARTUP_BUDGET_SERVER_MS', '1500')),
+}
+
+
+def send(proc: subprocess.Popen, message: dict):
+    proc.stdin.write(json.dumps(message).encode('utf-8') + b'\n')
+    proc.stdin.flush()
+
+
+def measure(script: str) -> dict:
+    """Spawn the server once and time its first two responses"""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, script)], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=HERE)
+    try:
+        send(proc, INITIALIZE)
+        proc.stdout.readline()
+        initialized = time.perf_counter()
+        send(proc, INITIALIZED)
+        send(proc, TOOLS_LIST)
+        proc.stdout.readline()
+        listed = time.perf_counter()
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=30)
+    return {'initialize_ms': (initialized - started) * 1000, 'tools_list_ms': (listed - initialized) * 1000}
+
+
+def bench(script: str, runs: int) -> dict:
+    samples = [measure(script) for _ in range(runs)]
+    initialize = [sample['initialize_ms'] for sample in samples]
+    tools_list = [sample['tools_list_ms'] for sample in samples]
+    return {
+        'server': script,
+        'runs': runs,
+        'initialize_p50_ms': round(statistics.median(initialize), 1),
+        'initialize_max_ms': round(max(initialize), 1),
+        'tools_list_p50_ms': round(statistics.median(tools_list), 2),
+        'budget_ms': BUDGETS[script]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MCP server time-to-first-initialize")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--check', action='store_true', help="Fail if a median is over its budget")
+    args = parser.parse_args()
+
+    over_budget = False
+    for script in BUDGETS:
+        result = bench(script, args.runs)
+        print(json.dumps(result))
+        over_budget = over_budget or result['initialize_p50_ms'] > result['budget_ms']
+
+    if args.check and over_budget:
+        print("Startup time is over budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-message overhead of the simple MCP server's stdio transport
+
+Runs simple_server.py with each transport (MCP_STDIO_TRANSPORT=thread is the
+old run_in_executor readline loop, stream is the asyncio pipe transport) and
+reports round-trip latency and pipelined throughput for `initialize` requests.
+
+Usage:
+    python bench_stdio.py [--messages 2000] [--payload-kb 0]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import statistics
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_server.py')
+
+
+def start_server(transport: str) -> subprocess.Popen:
+    env = dict(os.environ, MCP_STDIO_TRANSPORT=transport)
+    return subprocess.Popen([sys.executable, SERVER], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, env=env)
+
+
+def make_request(request_id: int, padding: str) -> bytes:
+    request = {"jsonrpc": "2.0", "id": request_id, "method": "initialize", "params": {"padding": padding}}
+    return json.dumps(request).encode('utf-8') + b'\n'
+
+
+def round_trips(proc: subprocess.Popen, count: int, padding: str) -> list:
+    """Send one request at a time and time each response"""
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        proc.stdin.write(make_request(i, padding))
+        proc.stdin.flush()
+        proc.stdout.readline()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def pipelined(proc: subprocess.Popen, count: int, padding: str) -> float:
+    """Write every request up front and return the seconds until all responses arrive"""
+    payload = b''.join(make_request(i, padding) for i in range(count))
+
+    def send():
+        proc.stdin.write(payload)
+        proc.stdin.flush()
+
+    # Write from a thread: the server stops reading while its responses are unread
+    started = time.perf_counter()
+    writer = threading.Thread(target=send)
+    writer.start()
+    for _ in range(count):
+        proc.stdout.readline()
+    elapsed = time.perf_counter() - started
+    writer.join()
+    return elapsed
+
+
+def bench(transport: str, count: int, padding: str) -> dict:
+    proc = start_server(transport)
+    try:
+        # Warm up (imports, first request) before timing
+        round_trips(proc, 20, padding)
+        latencies = round_trips(proc, count, padding)
+        total = pipelined(proc, count, padding)
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=30)
+    return {
+        'transport': transport,
+        'rtt_p50_us': round(statistics.median(latencies) * 1e6, 1),
+        'rtt_p99_us': round(sorted(latencies)[int(len(latencies) * 0.99) - 1] * 1e6, 1),
+        'pipelined_us_per_msg': round(total / count * 1e6, 1),
+        'pipelined_msgs_per_s': round(count / total)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure stdio transport overhead")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--payload-kb', type=int, default=0, help="Extra bytes per request, in KB")
+    args = parser.parse_args()
+
+    padding = 'x' * (args.payload_kb * 1024)
+    for transport in ('thread', 'stream'):
+        print(json.dumps(bench(transport, args.messages, padding)))
+
+
+if __name__ == '__main__':
+    main()
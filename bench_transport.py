@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: N stdio server processes vs one shared SSE server
+
+Each of N concurrent clients opens a session and makes a number of tool
+calls. In stdio mode every client spawns its own server.py process (as MCP
+clients do today); in sse mode all clients share one `server.py --transport sse`.
+
+Usage:
+    python bench_transport.py [--clients 10] [--calls 20] [--tool get_rate_limit_status]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client, StdioServerParameters
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+
+
+def rss_mb(pids) -> float:
+    """Total resident memory of the given processes (Linux only, else 0)"""
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1)
+
+
+def child_pids() -> list:
+    """Processes started by this benchmark (the stdio servers)"""
+    try:
+        output = subprocess.run(['pgrep', '-P', str(os.getpid())], capture_output=True, text=True).stdout
+    except OSError:
+        return []
+    return [int(pid) for pid in output.split()]
+
+
+async def run_client(open_streams, tool: str, arguments: dict, calls: int, latencies: list, connected: list):
+    started = time.perf_counter()
+    async with open_streams() as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            connected.append(time.perf_counter() - started)
+            for _ in range(calls):
+                call_started = time.perf_counter()
+                await session.call_tool(tool, arguments)
+                latencies.append(time.perf_counter() - call_started)
+
+
+async def bench(mode: str, clients: int, calls: int, tool: str, arguments: dict, url: str) -> dict:
+    if mode == 'stdio':
+        params = StdioServerParameters(command=sys.executable, args=[SERVER], env=dict(os.environ))
+        open_streams = lambda: stdio_client(params, errlog=open(os.devnull, 'w'))
+    else:
+        open_streams = lambda: sse_client(url)
+
+    latencies, connected = [], []
+    memory = []
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(0.5)
+            memory.append(rss_mb(child_pids()))
+
+    sampler = asyncio.ensure_future(sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(open_streams, tool, arguments, calls, latencies, connected)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    return {
+        'mode': mode,
+        'clients': clients,
+        'calls': len(latencies),
+        'wall_s': round(elapsed, 2),
+        'connect_p50_ms': round(statistics.median(connected) * 1000, 1),
+        'call_p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'call_p99_ms': round(sorted(latencies)[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        'calls_per_s': round(len(latencies) / elapsed),
+        'server_rss_mb': max(memory or [rss_mb(child_pids())])
+    }
+
+
+def wait_for_health(url: str, timeout: float = 30):
+    give_up_at = time.monotonic() + timeout
+    while time.monotonic() < give_up_at:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"SSE server did not come up at {url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare stdio processes with one shared SSE server")
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--calls', type=int, default=20, help="Tool calls per client")
+    parser.add_argument('--tool', default='get_rate_limit_status')
+    parser.add_argument('--arguments', default='{}', help="Tool arguments as JSON")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    arguments = json.loads(args.arguments)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(json.dumps(asyncio.run(bench('stdio', args.clients, args.calls, args.tool, arguments, None))))
+
+    sse_server = subprocess.Popen([sys.executable, SERVER, '--transport', 'sse', '--port', str(args.port)],
+                                  stderr=subprocess.DEVNULL)
+    try:
+        wait_for_health(f"{base_url}/health")
+        print(json.dumps(asyncio.run(bench('sse', args.clients, args.calls, args.tool, arguments,
+                                           f"{base_url}/sse"))))
+    finally:
+        sse_server.terminate()
+        sse_server.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Concurrent fan-out publishing of many posts across Facebook and Instagram
+"""
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from meta_errors import MetaAPIError
+from publish_jobs import InstagramPublisher, ProgressCallback, JOB_PUBLISHED, JOB_FAILED
+from resilience import CircuitOpenError, is_retryable
+
+DEFAULT_CONCURRENCY = int(os.getenv('BULK_PUBLISH_CONCURRENCY', '8'))
+MAX_BULK_POSTS = int(os.getenv('BULK_PUBLISH_MAX_POSTS', '100'))
+MAX_CONCURRENCY = int(os.getenv('BULK_PUBLISH_MAX_CONCURRENCY', '32'))
+
+PostToFeed = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def validate_post_spec(spec: Any) -> Optional[str]:
+    """Return an error message for an invalid post spec, or None"""
+    if not isinstance(spec, dict):
+        return 'Post spec must be an object'
+    platform = spec.get('platform')
+    if platform == 'facebook':
+        if not spec.get('page_id') or not spec.get('message'):
+            return 'Facebook posts require page_id and message'
+    elif platform == 'instagram':
+        if not spec.get('instagram_account_id') or not (spec.get('image_url') or spec.get('video_url')):
+            return 'Instagram posts require instagram_account_id and image_url or video_url'
+    else:
+        return "platform must be 'facebook' or 'instagram'"
+    return None
+
+
+def parse_concurrency(value: Any) -> int:
+    """A requested concurrency as a positive int capped at MAX_CONCURRENCY (None means the default)"""
+    if value is None:
+        return DEFAULT_CONCURRENCY
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError
+        concurrency = int(value)
+    except ValueError:
+        raise ValueError('concurrency must be a positive integer') from None
+    if concurrency < 1:
+        raise ValueError('concurrency must be a positive integer')
+    return min(concurrency, MAX_CONCURRENCY)
+
+
+def page_token_poster(meta_api) -> PostToFeed:
+    """post_to_feed for the async Meta clients: page access tokens are listed once (me/accounts)
+    on the first Facebook post and shared by every post after it"""
+    page_tokens: Dict[str, str] = {}
+    tokens_lock = asyncio.Lock()
+
+    async def post_to_feed(page_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        async with tokens_lock:
+            if not page_tokens:
+                async for page in meta_api.iter_edge("me/accounts", fields="id,access_token", limit=100):
+                    page_tokens[page.get("id")] = page.get("access_token")
+        if page_id not in page_tokens:
+            raise Exception(f"Could not find access token for page {page_id}")
+        return await meta_api.make_api_request(f"{page_id}/feed", "POST", data, access_token=page_tokens[page_id])
+
+    return post_to_feed
+
+
+def is_retry_safe(error: Exception) -> bool:
+    """True when the post was certainly not published, so trying again later can't duplicate it"""
+    if isinstance(error, CircuitOpenError):
+        return True
+    if isinstance(error, MetaAPIError) and error.is_throttle_error:
+        return True
+    return is_retryable(error, idempotent=False)
+
+
+async def publish_many(specs: List[Dict[str, Any]], post_to_feed: PostToFeed,
+                       publisher: InstagramPublisher, concurrency: Optional[int] = None,
+                       wait_for_instagram: bool = True,
+                       on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+    """Publish every spec concurrently and return one result per spec, in order.
+
+    At most `concurrency` posts are in flight at once. `post_to_feed` does
+    the Facebook page post (resolving page tokens as the caller sees fit).
+    Instagram posts go through `publisher`; with wait_for_instagram=False
+    they are reported as queued jobs as soon as they have been started.
+    `on_progress` is called as each post finishes.
+    """
+    semaphore = asyncio.Semaphore(parse_concurrency(concurrency))
+    finished = 0
+
+    async def publish_and_report(index: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal finished
+        result = await publish_one(index, spec)
+        finished += 1
+        if on_progress:
+            await on_progress(finished, len(specs), f"{finished}/{len(specs)} posts done")
+        return result
+
+    async def publish_one(index: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+        result = {'index': index, 'platform': spec.get('platform') if isinstance(spec, dict) else None}
+        error = validate_post_spec(spec)
+        if error:
+            result.update(success=False, error=error)
+            return result
+
+        if spec['platform'] == 'instagram' and not wait_for_instagram:
+            # Container polling can outlive the request; hand the job to the loop
+            job = publisher.create_job(
+                spec['instagram_account_id'], image_url=spec.get('image_url'), caption=spec.get('caption', ''),
+                video_url=spec.get('video_url'), media_type=spec.get('media_type')
+            )
+            publisher.start_job(job)
+            result.update(success=True, status=job['status'], job_id=job['id'])
+            return result
+
+        async with semaphore:
+            try:
+                if spec['platform'] == 'facebook':
+                    data = {'message': spec['message']}
+                    if spec.get('link'):
+                        data['link'] = spec['link']
+                    response = await post_to_feed(spec['page_id'], data)
+                    result.update(success=True, id=response.get('id'))
+                else:
+                    job = await publisher.publish(
+                        spec['instagram_account_id'], image_url=spec.get('image_url'),
+                        caption=spec.get('caption', ''), video_url=spec.get('video_url'),
+                        media_type=spec.get('media_type')
+                    )
+                    result.update(success=job['status'] == JOB_PUBLISHED, status=job['status'],
+                                  job_id=job['id'], id=job['media_id'])
+                    if job['status'] == JOB_FAILED:
+                        result['error'] = job['error']
+            except Exception as e:
+                logging.error(f"Bulk publish item {index} failed: {e}")
+                result.update(success=False, error=str(e), retry_safe=is_retry_safe(e))
+        return result
+
+    return list(await asyncio.gather(*(publish_and_report(i, spec) for i, spec in enumerate(specs))))
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap per-item results with success/failure counts"""
+    succeeded = sum(1 for result in results if result.get('success'))
+    return {'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded}
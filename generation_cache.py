@@ -0,0 +1,281 @@
+"""
+Content-addressed cache of OpenAI generations (memory LRU/TTL, optionally
+backed by SQLite or the Supabase generation_cache table)
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+import concurrent.futures
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from resilience import remaining_time
+
+
+def normalize_prompt(text: str) -> str:
+    """Prompt text with Unicode and whitespace differences removed (indentation, blank lines, trailing spaces)"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_prompt(value)
+    if isinstance(value, dict):
+        return {key: normalize_value(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(item) for item in value]
+    return value
+
+
+def to_iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+def generation_key(namespace: str, request: Dict[str, Any]) -> str:
+    """sha256 of the namespace plus model, normalized prompt/messages and parameters"""
+    canonical = json.dumps({'namespace': namespace, 'request': normalize_value(request)},
+                           sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class SQLiteGenerationStore:
+    """Generations persisted in a local SQLite file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('GENERATION_CACHE_DB_PATH', 'generation_cache.db')
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, expires_at FROM generation_cache WHERE cache_key = ? AND expires_at > ?',
+                               (key, time.time())).fetchone()
+        return {'value': json.loads(row[0]), 'expires_at': row[1]} if row else None
+
+    def put(self, key: str, namespace: str, value: Any, expires_at: float):
+        with self._lock, self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO generation_cache VALUES (?, ?, ?, ?, ?)',
+                         (key, namespace, json.dumps(value), time.time(), expires_at))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute('DELETE FROM generation_cache WHERE expires_at <= ?', (time.time(),))
+
+
+class SupabaseGenerationStore:
+    """Generations persisted in the Supabase generation_cache table (see supabase_setup.sql)"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.client = manager.client
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        response = self.manager._execute(
+            self.client.table('generation_cache').select('value, expires_at')
+            .eq('cache_key', key).gt('expires_at', to_iso(time.time()))
+        )
+        if not response.data:
+            return None
+        row = response.data[0]
+        expires_at = datetime.fromisoformat(row['expires_at'].replace('Z', '+00:00')).timestamp()
+        return {'value': row['value'], 'expires_at': expires_at}
+
+    def put(self, key: str, namespace: str, value: Any, expires_at: float):
+        self.manager._execute(self.client.table('generation_cache').upsert({
+            'cache_key': key,
+            'namespace': namespace,
+            'value': value,
+            'expires_at': to_iso(expires_at)
+        }, on_conflict='cache_key'))
+
+
+def get_generation_store():
+    """Persistent store chosen by GENERATION_CACHE_BACKEND: memory (none), sqlite or supabase"""
+    backend = os.getenv('GENERATION_CACHE_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteGenerationStore()
+    if backend == 'supabase':
+        from supabase_client import supabase_manager
+        if supabase_manager.is_available():
+            return SupabaseGenerationStore(supabase_manager)
+        logging.warning("GENERATION_CACHE_BACKEND=supabase but Supabase is not configured; caching in memory only")
+    return None
+
+
+class GenerationCache:
+    """LRU/TTL cache of generation results keyed by generation_key.
+
+    Identical requests that arrive while one is being generated wait for
+    it instead of paying for their own call. `bypass=True` (regenerate)
+    skips the lookup but stores the fresh result for later requests.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None, store=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('GENERATION_CACHE_TTL', '86400'))
+        self.max_entries = max_entries or int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', '512'))
+        self.store = store
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'store_hits': 0, 'misses': 0, 'coalesced': 0, 'bypassed': 0,
+                       'evictions': 0, 'store_errors': 0, 'saved_seconds': 0.0}
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry['expires_at'] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _store_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            self._stats['store_errors'] += 1
+            logging.warning(f"Generation cache store read failed: {e}")
+            return None
+
+    def _store_put(self, key: str, namespace: str, value: Any, expires_at: float):
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, namespace, value, expires_at)
+        except Exception as e:
+            self._stats['store_errors'] += 1
+            logging.warning(f"Generation cache store write failed: {e}")
+
+    def _cached(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entry from memory, else from the persistent store; counts the hit or miss"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry:
+                self._stats['hits'] += 1
+                self._stats['saved_seconds'] += entry['cost']
+                return entry
+        stored = self._store_get(key)
+        with self._lock:
+            if stored is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['store_hits'] += 1
+            entry = {'value': stored['value'], 'expires_at': stored['expires_at'], 'cost': 0.0}
+            self._remember(key, entry)
+            return entry
+
+    def _save(self, key: str, namespace: str, value: Any, ttl: float, cost: float = 0.0):
+        entry = {'value': value, 'expires_at': time.time() + ttl, 'cost': cost}
+        with self._lock:
+            self._remember(key, entry)
+        self._store_put(key, namespace, value, entry['expires_at'])
+
+    def get(self, namespace: str, request: Dict[str, Any]) -> Optional[Any]:
+        """Cached value for a request, or None (for callers that generate incrementally, e.g. streaming)"""
+        entry = self._cached(generation_key(namespace, request))
+        return entry['value'] if entry else None
+
+    def put(self, namespace: str, request: Dict[str, Any], value: Any, ttl: Optional[float] = None,
+            cost: float = 0.0):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl > 0:
+            self._save(generation_key(namespace, request), namespace, value, ttl, cost)
+
+    def bypass(self):
+        """Count a regenerate request that skipped the lookup"""
+        with self._lock:
+            self._stats['bypassed'] += 1
+
+    def get_or_generate(self, namespace: str, request: Dict[str, Any], generate: Callable[[], Any],
+                        bypass: bool = False, ttl: Optional[float] = None) -> Tuple[Any, bool]:
+        """(value, cached) for a generation request; `generate` is only called on a miss"""
+        key = generation_key(namespace, request)
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return generate(), False
+        if bypass:
+            self.bypass()
+            started = time.monotonic()
+            value = generate()
+            self._save(key, namespace, value, ttl, time.monotonic() - started)
+            return value, False
+
+        with self._lock:
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = concurrent.futures.Future()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            return pending.result(timeout=remaining_time()), True
+
+        try:
+            entry = self._cached(key)
+            if entry:
+                pending.set_result(entry['value'])
+                return entry['value'], True
+            started = time.monotonic()
+            value = generate()
+            self._save(key, namespace, value, ttl, time.monotonic() - started)
+            pending.set_result(value)
+            return value, False
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats['hits'] + self._stats['store_hits'] + self._stats['coalesced']
+            lookups = hits + self._stats['misses']
+            return dict(
+                self._stats,
+                saved_seconds=round(self._stats['saved_seconds'], 2),
+                entries=len(self._entries),
+                in_flight=len(self._pending),
+                hit_ratio=round(hits / lookups, 3) if lookups else None,
+                ttl=self.ttl,
+                max_entries=self.max_entries,
+                backend=type(self.store).__name__ if self.store is not None else 'memory'
+            )
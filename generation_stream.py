@@ -0,0 +1,167 @@
+"""
+Streaming helpers for OpenAI completions: SSE framing, incremental
+COPY/HASHTAGS parsing and time-to-first-token metrics
+"""
+import json
+import time
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tool_registry import LatencyHistogram
+
+# Section markers of the smart post completion format, in the order they appear
+POST_MARKERS = (('COPY:', 'copy'), ('HASHTAGS:', 'hashtags'))
+
+
+def parse_post_copy(generated_content: str) -> Tuple[str, str]:
+    """Split a COPY:/HASHTAGS: completion into (copy, hashtags)"""
+    copy_start = generated_content.find("COPY:") + 5
+    hashtags_start = generated_content.find("HASHTAGS:")
+
+    if hashtags_start == -1:
+        return generated_content[copy_start:].strip(), ""
+    return generated_content[copy_start:hashtags_start].strip(), generated_content[hashtags_start + 9:].strip()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_deltas(stream: Iterable[Any]) -> Iterator[str]:
+    """Text deltas of a streamed chat completion, closing the stream when done"""
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+
+
+class PostCopyParser:
+    """Splits a streamed COPY:/HASHTAGS: completion into section deltas as it arrives.
+
+    A marker can be split across chunks, so text that might be the start of
+    one is held back until the next chunk decides it. The final copy and
+    hashtags come from parse_post_copy over the whole text, so they match
+    the non-streaming response exactly.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.section: Optional[str] = None
+        self._pending = ''
+        self._started = set()
+
+    def _next_markers(self) -> List[Tuple[str, str]]:
+        if self.section is None:
+            return list(POST_MARKERS)
+        sections = [section for _, section in POST_MARKERS]
+        return list(POST_MARKERS[sections.index(self.section) + 1:])
+
+    def _emit(self, events: List[Tuple[str, str]], text: str):
+        if not text or self.section is None:
+            return
+        if self.section not in self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started.add(self.section)
+        events.append((self.section, text))
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        """Add a chunk; returns (section, text) pairs that are now certain"""
+        self.text += delta
+        buffer = self._pending + delta
+        events: List[Tuple[str, str]] = []
+        while True:
+            found = [(buffer.find(marker), marker, section)
+                     for marker, section in self._next_markers() if marker in buffer]
+            if not found:
+                break
+            index, marker, section = min(found)
+            self._emit(events, buffer[:index])
+            buffer = buffer[index + len(marker):]
+            self.section = section
+
+        hold = 0
+        for marker, _ in self._next_markers():
+            for size in range(min(len(marker) - 1, len(buffer)), hold, -1):
+                if marker.startswith(buffer[-size:]):
+                    hold = size
+                    break
+        self._emit(events, buffer[:len(buffer) - hold])
+        self._pending = buffer[len(buffer) - hold:]
+        return events
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """Flush held-back text once the stream has ended"""
+        events: List[Tuple[str, str]] = []
+        self._emit(events, self._pending)
+        self._pending = ''
+        return events
+
+    def result(self) -> Tuple[str, str]:
+        return parse_post_copy(self.text)
+
+
+class GenerationTimer:
+    """Times one generation: time to first token and total duration"""
+
+    def __init__(self, name: str, streamed: bool):
+        self.name = name
+        self.streamed = streamed
+        self.started = time.perf_counter()
+        self.first_token_ms: Optional[float] = None
+
+    def first_token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self.started) * 1000
+
+    def finish(self, error: bool = False) -> Dict[str, Any]:
+        total_ms = (time.perf_counter() - self.started) * 1000
+        generation_metrics.record(self, total_ms, error)
+        return {
+            'ttft_ms': round(self.first_token_ms, 1) if self.first_token_ms is not None else None,
+            'total_ms': round(total_ms, 1)
+        }
+
+
+class GenerationMetrics:
+    """Time-to-first-token and total latency histograms per endpoint and mode"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, timer: GenerationTimer, total_ms: float, error: bool = False):
+        key = f"{timer.name}:{'stream' if timer.streamed else 'json'}"
+        with self._lock:
+            series = self._series.setdefault(key, {
+                'ttft': LatencyHistogram(), 'total': LatencyHistogram(), 'errors': 0
+            })
+            if error:
+                series['errors'] += 1
+            if timer.first_token_ms is not None:
+                series['ttft'].observe(timer.first_token_ms)
+            series['total'].observe(total_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {
+                    'time_to_first_token': series['ttft'].snapshot(),
+                    'total': series['total'].snapshot(),
+                    'errors': series['errors']
+                }
+                for key, series in self._series.items()
+            }
+
+
+# Global instance
+generation_metrics = GenerationMetrics()
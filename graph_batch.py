@@ -0,0 +1,184 @@
+"""
+Graph API batch requests for MetaAPI
+"""
+import os
+import json
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlencode
+
+from meta_errors import MetaAPIError
+
+# Graph API accepts at most 50 sub-requests per batch call
+MAX_BATCH_SIZE = 50
+
+# Batch calls the async clients keep in flight at once
+BATCH_CONCURRENCY = int(os.getenv('GRAPH_BATCH_CONCURRENCY', '4'))
+
+# Most pages/accounts one get_insights_many tool call may ask for
+MAX_INSIGHT_TARGETS = int(os.getenv('BULK_INSIGHTS_MAX_TARGETS', '200'))
+
+
+class GraphBatch:
+    """Collects Graph sub-requests and sends them as `batch` calls.
+
+    Sub-requests are packed into chunks of up to MAX_BATCH_SIZE, and
+    `execute` returns one outcome per `add` call, in order: the parsed body
+    for successful sub-requests or a MetaAPIError for failed ones.
+    """
+
+    def __init__(self, meta_api, max_size: int = MAX_BATCH_SIZE):
+        self.meta_api = meta_api
+        self.max_size = min(max_size, MAX_BATCH_SIZE)
+        self.requests: List[Dict[str, str]] = []
+
+    def add(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+            method: str = 'GET', access_token: Optional[str] = None) -> int:
+        """Queue a sub-request and return its index in the results"""
+        query = dict(params or {})
+        if access_token:
+            # Per-request token, e.g. a page access token inside a user-token batch
+            query['access_token'] = access_token
+        relative_url = endpoint
+        if query:
+            relative_url += '?' + urlencode(query)
+        self.requests.append({'method': method, 'relative_url': relative_url})
+        return len(self.requests) - 1
+
+    def _chunks(self) -> List[List[Dict[str, str]]]:
+        return [self.requests[start:start + self.max_size] for start in range(0, len(self.requests), self.max_size)]
+
+    @staticmethod
+    def _payload(chunk: List[Dict[str, str]]) -> Dict[str, str]:
+        return {'batch': json.dumps(chunk), 'include_headers': 'false'}
+
+    def execute(self) -> List[Union[Dict[str, Any], MetaAPIError]]:
+        """Send the queued sub-requests and return their outcomes in order"""
+        outcomes: List[Union[Dict[str, Any], MetaAPIError]] = []
+        for chunk in self._chunks():
+            responses = self.meta_api.make_api_request("", "POST", self._payload(chunk))
+            for response in responses:
+                outcomes.append(parse_batch_response(response))
+        self.requests = []
+        return outcomes
+
+    async def aexecute(self, concurrency: Optional[int] = None) -> List[Union[Dict[str, Any], MetaAPIError]]:
+        """Async execute for the aiohttp clients, sending up to `concurrency` batch calls at once.
+
+        A batch call that fails outright is reported as that error for each
+        of its sub-requests, so one bad chunk doesn't sink the others.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or BATCH_CONCURRENCY))
+
+        async def send(chunk: List[Dict[str, str]]) -> List[Union[Dict[str, Any], MetaAPIError]]:
+            async with semaphore:
+                try:
+                    responses = await self.meta_api.make_api_request("", "POST", self._payload(chunk))
+                except MetaAPIError as e:
+                    return [e] * len(chunk)
+                except Exception as e:
+                    return [MetaAPIError(str(e))] * len(chunk)
+            return [parse_batch_response(response) for response in responses]
+
+        chunk_outcomes = await asyncio.gather(*(send(chunk) for chunk in self._chunks()))
+        self.requests = []
+        return [outcome for outcomes in chunk_outcomes for outcome in outcomes]
+
+
+def parse_batch_response(response: Optional[Dict[str, Any]]) -> Union[Dict[str, Any], MetaAPIError]:
+    """Turn one element of a batch response into a body or a MetaAPIError"""
+    if response is None:
+        # Graph returns null for sub-requests that didn't finish in time
+        return MetaAPIError('Batch sub-request timed out')
+
+    try:
+        body = json.loads(response.get('body') or '{}')
+    except ValueError:
+        body = {}
+
+    status = response.get('code', 200)
+    if status >= 400:
+        return MetaAPIError.from_response(status, body)
+    return body
+
+
+def format_data_point(data_point: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an insights data point to its latest value"""
+    values = data_point.get('values') or [{}]
+    return {
+        'name': data_point.get('name', 'Unknown'),
+        'value': values[0].get('value', 'N/A'),
+        'period': data_point.get('period', 'Unknown')
+    }
+
+
+def _queue_insights(batch: GraphBatch, targets: Sequence[Tuple[str, Optional[str]]], metrics: Sequence[str],
+                    period: Optional[str]):
+    params = {'metric': ','.join(metrics)}
+    if period:
+        params['period'] = period
+    for object_id, access_token in targets:
+        batch.add(f"{object_id}/insights", params, access_token=access_token)
+
+
+def _collect_insights(targets: Sequence[Tuple[str, Optional[str]]], metrics: Sequence[str],
+                      outcomes: List[Union[Dict[str, Any], MetaAPIError]]) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for (object_id, _), outcome in zip(targets, outcomes):
+        if isinstance(outcome, MetaAPIError):
+            results[object_id] = {'error': str(outcome)}
+            continue
+
+        by_metric: Dict[str, Any] = {metric: None for metric in metrics}
+        for data_point in outcome.get('data', []):
+            insight = format_data_point(data_point)
+            by_metric[insight['name']] = {'value': insight['value'], 'period': insight['period']}
+        results[object_id] = {'metrics': by_metric}
+
+    return results
+
+
+def batch_insights(meta_api, targets: Sequence[Tuple[str, Optional[str]]], metrics: Sequence[str],
+                   period: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Fetch insights for many objects in as few batch calls as possible.
+
+    `targets` is a list of (object_id, access_token) pairs; the token may be
+    None to use the MetaAPI default. Returns {object_id: {'metrics': {...}}}
+    with an 'error' entry instead for objects whose sub-request failed.
+    """
+    batch = GraphBatch(meta_api)
+    _queue_insights(batch, targets, metrics, period)
+    return _collect_insights(targets, metrics, batch.execute())
+
+
+async def abatch_insights(meta_api, targets: Sequence[Tuple[str, Optional[str]]], metrics: Sequence[str],
+                          period: Optional[str] = None, concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Async batch_insights for the aiohttp-based clients"""
+    batch = GraphBatch(meta_api)
+    _queue_insights(batch, targets, metrics, period)
+    return _collect_insights(targets, metrics, await batch.aexecute(concurrency))
+
+
+def as_list(value: Union[str, Sequence[str], None]) -> List[str]:
+    """Accept either a list or a comma separated string of ids/metrics"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+async def insights_many(meta_api, object_ids: Union[str, Sequence[str]], metrics: Union[str, Sequence[str]],
+                        period: Optional[str] = None, concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Insights for many pages/accounts (the get_insights_many MCP tool), with success/failure counts"""
+    object_ids = list(dict.fromkeys(as_list(object_ids)))
+    metrics = as_list(metrics)
+    if not object_ids or not metrics:
+        raise ValueError('object_ids and metrics must not be empty')
+    if len(object_ids) > MAX_INSIGHT_TARGETS:
+        raise ValueError(f'At most {MAX_INSIGHT_TARGETS} objects per call')
+
+    results = await abatch_insights(meta_api, [(object_id, None) for object_id in object_ids], metrics,
+                                    period, concurrency)
+    failed = sum(1 for result in results.values() if 'error' in result)
+    return {'results': results, 'succeeded': len(results) - failed, 'failed': failed}
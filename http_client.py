@@ -0,0 +1,84 @@
+"""
+Shared connection-pooled HTTP client for the Flask entry points
+"""
+import os
+import atexit
+import logging
+import threading
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledHTTPClient:
+    """Keep-alive requests.Session shared by every MetaAPI instance in the process.
+
+    Reusing one session means graph.facebook.com connections are kept open
+    between calls instead of paying a TCP+TLS handshake on every request.
+    """
+
+    def __init__(self):
+        # Number of distinct hosts to keep a pool for, and connections kept per host
+        self.pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+        self.pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+        self.pool_block = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+        self.connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '20'))
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Default (connect, read) timeout pair"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def get_session(self) -> requests.Session:
+        """Return the shared session, creating it on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        logging.info(
+            f"HTTP pool created (hosts={self.pool_connections}, per_host={self.pool_maxsize})"
+        )
+        return session
+
+    def request(self, method: str, url: str,
+                timeout: Optional[Union[float, Tuple[float, float]]] = None,
+                **kwargs) -> requests.Response:
+        """Send a request over the pooled session.
+
+        A single number caps both the connect and read timeouts, e.g. to the
+        time left in the route's deadline.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        elif isinstance(timeout, (int, float)):
+            timeout = (min(self.connect_timeout, timeout), min(self.read_timeout, timeout))
+        return self.get_session().request(method, url, timeout=timeout, **kwargs)
+
+    def close(self):
+        """Close all pooled connections; the next request opens a fresh pool"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Global instance
+http_client = PooledHTTPClient()
+atexit.register(http_client.close)
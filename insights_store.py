@@ -0,0 +1,225 @@
+"""
+Local time-series store for Facebook/Instagram insights with incremental sync
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Insights periods that are not a time series and so have no watermark
+UNWINDOWED_PERIODS = ('lifetime',)
+
+DAY_SECONDS = 86400
+
+IterEdge = Callable[..., Iterable[Dict[str, Any]]]
+
+
+def default_db_path() -> str:
+    """INSIGHTS_DB_PATH, else /tmp on Vercel (the only writable directory there), else ./insights.db"""
+    return os.getenv('INSIGHTS_DB_PATH') or ('/tmp/insights.db' if os.getenv('VERCEL') else 'insights.db')
+
+
+def to_end_time(value: Any) -> str:
+    """Normalize a Graph end_time, unix timestamp or ISO date to a sortable UTC string"""
+    if value in (None, ''):
+        return ''
+    text = str(value).strip()
+    if text.isdigit():
+        moment = datetime.fromtimestamp(int(text), timezone.utc)
+    else:
+        try:
+            # Graph returns offsets without a colon, e.g. 2024-05-01T07:00:00+0000
+            moment = datetime.strptime(text, '%Y-%m-%dT%H:%M:%S%z')
+        except ValueError:
+            moment = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+
+def end_time_to_unix(end_time: str) -> int:
+    return int(datetime.fromisoformat(end_time).timestamp())
+
+
+class InsightsStore:
+    """SQLite table of insight values keyed by (object, metric, period, end_time).
+
+    Sync pulls only the window after each series' newest stored end_time, so
+    repeated dashboard views cost no Graph calls until the data is stale.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_db_path()
+        # How long a synced series is served without asking Graph for newer values
+        self.sync_interval = float(os.getenv('INSIGHTS_SYNC_INTERVAL', '900'))
+        # How far back the first sync of a series reaches (Graph allows at most 93 days per window)
+        self.backfill_days = int(os.getenv('INSIGHTS_BACKFILL_DAYS', '90'))
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS insights (
+                    object_id TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    value TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (object_id, metric, period, end_time)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS insights_sync (
+                    object_id TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (object_id, metric, period)
+                ) WITHOUT ROWID
+            ''')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def store(self, object_id: str, data_points: Iterable[Dict[str, Any]]) -> int:
+        """Upsert Graph insights rows ({name, period, values}); returns values written"""
+        now = time.time()
+        rows = [
+            (object_id, data_point.get('name'), data_point.get('period', 'Unknown'),
+             to_end_time(value.get('end_time')), json.dumps(value.get('value')), now)
+            for data_point in data_points
+            for value in data_point.get('values', [])
+        ]
+        if rows:
+            with self._lock, self._connect() as conn:
+                conn.executemany('INSERT OR REPLACE INTO insights VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def watermark(self, object_id: str, metric: str, period: str) -> Optional[str]:
+        """Newest stored end_time for a series, or None if nothing is stored"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(end_time) FROM insights WHERE object_id = ? AND metric = ? AND period = ? AND end_time != ''",
+                (object_id, metric, period)
+            ).fetchone()
+        return row[0] if row else None
+
+    def synced_at(self, object_id: str, metric: str, period: str) -> float:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT synced_at FROM insights_sync WHERE object_id = ? AND metric = ? AND period = ?',
+                (object_id, metric, period)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def _mark_synced(self, object_id: str, metrics: List[str], period: str, synced_at: float):
+        with self._lock, self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO insights_sync VALUES (?, ?, ?, ?)',
+                             [(object_id, metric, period, synced_at) for metric in metrics])
+
+    def _sync_start(self, object_id: str, metric: str, period: str, now: float) -> Optional[int]:
+        if period in UNWINDOWED_PERIODS:
+            return None
+        earliest = int(now) - self.backfill_days * DAY_SECONDS
+        watermark = self.watermark(object_id, metric, period)
+        if not watermark:
+            return earliest
+        # Re-read the newest stored day; Meta keeps revising the latest values
+        return max(earliest, end_time_to_unix(watermark) - DAY_SECONDS)
+
+    def sync(self, iter_edge: IterEdge, object_id: str, metrics: List[str], period: str = 'day',
+             force: bool = False) -> int:
+        """Fetch values newer than each series' watermark; returns values written.
+
+        `iter_edge` is a MetaAPI.iter_edge-style callable (endpoint, params=...).
+        Series synced within INSIGHTS_SYNC_INTERVAL are skipped unless forced.
+        """
+        now = time.time()
+        due = [metric for metric in metrics
+               if force or self.synced_at(object_id, metric, period) < now - self.sync_interval]
+
+        # Metrics that share a start window are fetched in one request
+        windows: Dict[Optional[int], List[str]] = {}
+        for metric in due:
+            windows.setdefault(self._sync_start(object_id, metric, period, now), []).append(metric)
+
+        written = 0
+        for since, window_metrics in windows.items():
+            params = {'metric': ','.join(window_metrics), 'period': period}
+            if since is not None:
+                params.update(since=since, until=int(now))
+            written += self.store(object_id, iter_edge(f"{object_id}/insights", params=params))
+            self._mark_synced(object_id, window_metrics, period, now)
+        if due:
+            logging.info(f"Synced {written} insight values for {object_id} ({', '.join(due)}/{period})")
+        return written
+
+    def series(self, object_id: str, metrics: List[str], period: Optional[str] = None,
+               since: Any = None, until: Any = None) -> List[Dict[str, Any]]:
+        """Stored values as one {name, period, values} series per metric, oldest first"""
+        if not metrics:
+            return []
+        query = f"SELECT metric, period, end_time, value FROM insights WHERE object_id = ? " \
+                f"AND metric IN ({','.join('?' * len(metrics))})"
+        params: List[Any] = [object_id] + list(metrics)
+        if period:
+            query += ' AND period = ?'
+            params.append(period)
+        if since:
+            query += ' AND end_time >= ?'
+            params.append(to_end_time(since))
+        if until:
+            query += ' AND end_time <= ?'
+            params.append(to_end_time(until))
+        query += ' ORDER BY metric, period, end_time'
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        series: Dict[tuple, Dict[str, Any]] = {}
+        for metric, row_period, end_time, value in rows:
+            key = (metric, row_period)
+            if key not in series:
+                series[key] = {'name': metric, 'period': row_period, 'values': []}
+            point = {'value': json.loads(value)}
+            if end_time:
+                point['end_time'] = end_time
+            series[key]['values'].append(point)
+        return list(series.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Facebook/Instagram insights into the local store")
+    parser.add_argument('--metric', default='page_views', help="Comma separated page metrics")
+    parser.add_argument('--period', default='day')
+    parser.add_argument('--instagram-account', action='append', default=[],
+                        help="Instagram account id to sync as well (repeatable)")
+    parser.add_argument('--instagram-metric', default='impressions', help="Comma separated Instagram metrics")
+    parser.add_argument('--force', action='store_true', help="Ignore INSIGHTS_SYNC_INTERVAL")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app import sync_insights
+    result = sync_insights(
+        [m.strip() for m in args.metric.split(',') if m.strip()], args.period,
+        instagram_account_ids=args.instagram_account,
+        instagram_metrics=[m.strip() for m in args.instagram_metric.split(',') if m.strip()],
+        force=args.force
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
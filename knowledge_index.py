@@ -0,0 +1,191 @@
+"""
+In-process BM25 index over claude_knowledge passages for chat retrieval
+"""
+import os
+import re
+import math
+import heapq
+import threading
+from functools import lru_cache
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+TOP_K = int(os.getenv('KNOWLEDGE_TOP_K', '3'))
+TOKEN_BUDGET = int(os.getenv('KNOWLEDGE_TOKEN_BUDGET', '800'))
+PASSAGE_WORDS = int(os.getenv('KNOWLEDGE_PASSAGE_WORDS', '120'))
+
+# BM25 parameters; title terms count TITLE_WEIGHT times towards a passage's term frequency
+K1 = 1.5
+B = 0.75
+TITLE_WEIGHT = 2
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by can do does for from has have how i if in is it its me my of on or our '
+    'so that the their them there these they this to us was we what when where which who why will with '
+    'you your'.split()
+)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+@lru_cache(maxsize=65536)
+def normalize_term(term: str) -> str:
+    """Term as indexed: '' for stopwords, and a trailing plural 's' is dropped so 'plans' matches 'plan'"""
+    if term in STOPWORDS:
+        return ''
+    if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, normalized terms without stopwords"""
+    return [term for term in map(normalize_term, TOKEN_RE.findall((text or '').lower())) if term]
+
+
+def approx_tokens(text: str) -> int:
+    """Rough model token count (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def split_passages(content: str, words_per_passage: int = PASSAGE_WORDS) -> List[str]:
+    words = (content or '').split()
+    if not words:
+        return []
+    return [' '.join(words[start:start + words_per_passage]) for start in range(0, len(words), words_per_passage)]
+
+
+class KnowledgeIndex:
+    """BM25 inverted index over knowledge items, split into passages.
+
+    Items can be added (or replaced, by id) one at a time, so saving a
+    knowledge item doesn't rebuild the index.
+    """
+
+    def __init__(self, items: Iterable[Dict[str, Any]] = ()):
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._passages: Dict[int, Dict[str, Any]] = {}
+        self._item_passages: Dict[str, List[int]] = {}
+        self._item_sources: Dict[str, tuple] = {}
+        self._total_length = 0
+        self._norms: Optional[Dict[int, float]] = None
+        self._next_id = 0
+        self._lock = threading.RLock()
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def add(self, item: Dict[str, Any]):
+        """Index a knowledge item, replacing an earlier version with the same id"""
+        with self._lock:
+            item_key = str(item.get('id') or f"item-{self._next_id}")
+            self.remove(item_key)
+            self._norms = None
+            title = item.get('title', '') or ''
+            title_terms = tokenize(title)
+            passage_ids = []
+            for text in split_passages(item.get('content', '')) or ([title] if title else []):
+                terms = Counter(tokenize(text))
+                for term in title_terms:
+                    terms[term] += TITLE_WEIGHT
+                if not terms:
+                    continue
+                passage_id = self._next_id
+                self._next_id += 1
+                length = sum(terms.values())
+                self._passages[passage_id] = {'item_id': item_key, 'title': title, 'text': text,
+                                              'length': length, 'terms': terms}
+                for term, count in terms.items():
+                    self._postings[term][passage_id] = count
+                self._total_length += length
+                passage_ids.append(passage_id)
+            self._item_passages[item_key] = passage_ids
+            self._item_sources[item_key] = (title, item.get('content', ''))
+
+    def remove(self, item_id: Any):
+        with self._lock:
+            self._item_sources.pop(str(item_id), None)
+            for passage_id in self._item_passages.pop(str(item_id), []):
+                self._norms = None
+                passage = self._passages.pop(passage_id)
+                self._total_length -= passage['length']
+                for term in passage['terms']:
+                    postings = self._postings[term]
+                    postings.pop(passage_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def copy(self) -> 'KnowledgeIndex':
+        """Independent copy; passages themselves are never modified, so they are shared"""
+        with self._lock:
+            other = KnowledgeIndex()
+            other._postings = defaultdict(dict, ((term, dict(postings)) for term, postings in self._postings.items()))
+            other._passages = dict(self._passages)
+            other._item_passages = {key: list(ids) for key, ids in self._item_passages.items()}
+            other._item_sources = dict(self._item_sources)
+            other._total_length = self._total_length
+            other._next_id = self._next_id
+            return other
+
+    def synced(self, items: Iterable[Dict[str, Any]]) -> 'KnowledgeIndex':
+        """A new index matching a fresh list of items (all with ids), re-indexing only what changed.
+
+        This index is left untouched: requests holding the previous context may still be searching it.
+        """
+        other = self.copy()
+        seen = set()
+        for item in items:
+            item_key = str(item['id'])
+            seen.add(item_key)
+            if other._item_sources.get(item_key) != (item.get('title', '') or '', item.get('content', '')):
+                other.add(item)
+        for item_key in [key for key in other._item_passages if key not in seen]:
+            other.remove(item_key)
+        return other
+
+    def _length_norms(self) -> Dict[int, float]:
+        """BM25 length normalization per passage, recomputed after the index changes"""
+        if self._norms is None:
+            average_length = self._total_length / len(self._passages)
+            self._norms = {passage_id: K1 * (1 - B + B * passage['length'] / average_length)
+                           for passage_id, passage in self._passages.items()}
+        return self._norms
+
+    def search(self, query: str, k: Optional[int] = None, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Best-scoring passages for a query, at most k of them and within token_budget tokens"""
+        k = TOP_K if k is None else k
+        token_budget = TOKEN_BUDGET if token_budget is None else token_budget
+        with self._lock:
+            count = len(self._passages)
+            if not count:
+                return []
+            norms = self._length_norms()
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                weight = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)) * (K1 + 1)
+                for passage_id, frequency in postings.items():
+                    scores[passage_id] = scores.get(passage_id, 0.0) + weight * frequency / (frequency + norms[passage_id])
+
+            # Rank a few spares so passages that don't fit the budget can be skipped
+            ranked = heapq.nlargest(k * 4, scores.items(), key=lambda entry: (entry[1], -entry[0]))
+            results, used = [], 0
+            for passage_id, score in ranked:
+                passage = self._passages[passage_id]
+                tokens = approx_tokens(passage['text'])
+                if used + tokens > token_budget:
+                    continue
+                results.append({'item_id': passage['item_id'], 'title': passage['title'], 'text': passage['text'],
+                                'score': round(score, 4), 'tokens': tokens})
+                used += tokens
+                if len(results) >= k:
+                    break
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'items': len(self._item_passages), 'passages': len(self._passages), 'terms': len(self._postings)}
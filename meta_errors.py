@@ -0,0 +1,43 @@
+"""
+Error types for Meta Graph API responses
+"""
+from typing import Any, Dict, Optional
+
+# OAuthException codes meaning the access token is invalid, expired or revoked
+TOKEN_ERROR_CODES = {102, 190}
+
+# Application, user, page and business use case rate limit codes
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80001}
+
+
+class MetaAPIError(Exception):
+    """Error returned by the Graph API, keeping Meta's error code for callers"""
+
+    def __init__(self, message: str, code: Optional[int] = None,
+                 subcode: Optional[int] = None, status: Optional[int] = None):
+        super().__init__(f"Meta API Error: {message}")
+        self.message = message
+        self.code = code
+        self.subcode = subcode
+        self.status = status
+
+    @classmethod
+    def from_response(cls, status: int, result: Dict[str, Any]) -> 'MetaAPIError':
+        """Build an error from a Graph API error payload"""
+        error = result.get('error', {}) if isinstance(result, dict) else {}
+        return cls(
+            error.get('message', 'Unknown error'),
+            code=error.get('code'),
+            subcode=error.get('error_subcode'),
+            status=status
+        )
+
+    @property
+    def is_token_error(self) -> bool:
+        """True when Meta rejected the access token itself"""
+        return self.code in TOKEN_ERROR_CODES
+
+    @property
+    def is_throttle_error(self) -> bool:
+        """True when Meta rejected the call because a rate limit was reached"""
+        return self.code in THROTTLE_ERROR_CODES
@@ -0,0 +1,296 @@
+"""
+Meta MCP tools, registered once and served by both server.py and simple_server.py
+"""
+import os
+import json
+from typing import Any, Dict, Optional
+
+from bulk_publish import publish_many, page_token_poster, summarize, DEFAULT_CONCURRENCY, MAX_BULK_POSTS
+from graph_batch import insights_many, MAX_INSIGHT_TARGETS
+from graph_paging import merge_insight_series
+from publish_jobs import JOB_PUBLISHED, ProgressCallback
+from rate_limit import usage_governor
+from tool_registry import ToolRegistry
+
+# Publishing waits for Instagram to process media, so it gets a longer timeout than reads
+PUBLISH_TOOL_TIMEOUT = float(os.getenv('MCP_PUBLISH_TOOL_TIMEOUT', '900'))
+
+registry = ToolRegistry()
+
+
+class ToolContext:
+    """What a tool call runs against: the transport's Graph client, publisher and
+    response cache, plus a progress callback when the client asked for one"""
+
+    def __init__(self, meta_api, instagram_publisher, tool_cache=None,
+                 on_progress: Optional[ProgressCallback] = None):
+        self.meta_api = meta_api
+        self.instagram_publisher = instagram_publisher
+        self.tool_cache = tool_cache
+        self.on_progress = on_progress
+
+
+async def fetch_insight_rows(ctx: ToolContext, endpoint: str, params: dict) -> list:
+    """Collect every insights row of an edge, reporting progress as rows arrive"""
+    rows = []
+    async for row in ctx.meta_api.iter_edge(endpoint, params=params):
+        rows.append(row)
+        if ctx.on_progress:
+            await ctx.on_progress(len(rows), None, f"Fetched {len(rows)} insight rows")
+    return rows
+
+
+def format_insights(title: str, rows: list) -> str:
+    insights_text = f"{title}:\n"
+    for series in merge_insight_series(rows):
+        insights_text += f"- {series['name']}: {(series['values'] or [{}])[0].get('value', 'N/A')}\n"
+    return insights_text
+
+
+@registry.tool(
+    "post_to_facebook_page",
+    "Post content to a Facebook page",
+    {
+        "type": "object",
+        "properties": {
+            "page_id": {"type": "string", "description": "Facebook page ID"},
+            "message": {"type": "string", "description": "Text content to post"},
+            "link": {"type": "string", "description": "Optional URL to include in post"}
+        },
+        "required": ["page_id", "message"]
+    },
+    concurrency=8
+)
+async def post_to_facebook_page(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    data = {"message": args["message"]}
+    if args.get("link"):
+        data["link"] = args["link"]
+
+    result = await ctx.meta_api.make_api_request(f"{args['page_id']}/feed", "POST", data)
+    return f"Successfully posted to Facebook page. Post ID: {result.get('id', 'Unknown')}"
+
+
+@registry.tool(
+    "post_to_instagram",
+    "Post content to Instagram (requires Instagram Business Account)",
+    {
+        "type": "object",
+        "properties": {
+            "instagram_account_id": {"type": "string", "description": "Instagram Business Account ID"},
+            "image_url": {"type": "string", "description": "URL of image to post"},
+            "caption": {"type": "string", "description": "Caption for the Instagram post"}
+        },
+        "required": ["instagram_account_id", "image_url"]
+    },
+    timeout=PUBLISH_TOOL_TIMEOUT,
+    concurrency=4
+)
+async def post_to_instagram(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    # Create the media container, wait for it to finish processing, then publish
+    job = await ctx.instagram_publisher.publish(args["instagram_account_id"], image_url=args["image_url"],
+                                                caption=args.get("caption") or "", on_progress=ctx.on_progress)
+    if job["status"] != JOB_PUBLISHED:
+        raise Exception(job["error"])
+
+    return f"Successfully posted to Instagram. Media ID: {job.get('media_id') or 'Unknown'}"
+
+
+@registry.tool(
+    "get_facebook_page_insights",
+    "Get analytics/insights for a Facebook page",
+    {
+        "type": "object",
+        "properties": {
+            "page_id": {"type": "string", "description": "Facebook page ID"},
+            "metric": {
+                "type": "string",
+                "description": "Metric to retrieve (e.g., page_views, page_fans, page_impressions)",
+                "default": "page_views"
+            },
+            "period": {"type": "string", "description": "Time period (day, week, days_28)", "default": "day"}
+        },
+        "required": ["page_id"]
+    },
+    concurrency=8
+)
+async def get_facebook_page_insights(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    page_id = args["page_id"]
+    rows = await fetch_insight_rows(ctx, f"{page_id}/insights", {"metric": args["metric"], "period": args["period"]})
+    return format_insights(f"Facebook Page Insights for {page_id}", rows)
+
+
+@registry.tool(
+    "get_instagram_insights",
+    "Get analytics/insights for Instagram posts",
+    {
+        "type": "object",
+        "properties": {
+            "instagram_account_id": {"type": "string", "description": "Instagram Business Account ID"},
+            "metric": {
+                "type": "string",
+                "description": "Metric to retrieve (e.g., impressions, reach, engagement)",
+                "default": "impressions"
+            }
+        },
+        "required": ["instagram_account_id"]
+    },
+    concurrency=8
+)
+async def get_instagram_insights(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    instagram_account_id = args["instagram_account_id"]
+    rows = await fetch_insight_rows(ctx, f"{instagram_account_id}/insights", {"metric": args["metric"]})
+    return format_insights(f"Instagram Insights for {instagram_account_id}", rows)
+
+
+@registry.tool(
+    "generate_content_ideas",
+    "Generate content ideas based on a topic or theme",
+    {
+        "type": "object",
+        "properties": {
+            "topic": {"type": "string", "description": "Topic or theme for content ideas"},
+            "platform": {
+                "type": "string",
+                "description": "Platform to optimize for (facebook, instagram, both)",
+                "enum": ["facebook", "instagram", "both"],
+                "default": "both"
+            },
+            "count": {"type": "integer", "description": "Number of ideas to generate", "default": 5}
+        },
+        "required": ["topic"]
+    }
+)
+async def generate_content_ideas(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    topic = args["topic"]
+    platform = args["platform"]
+
+    # Simple content idea generator
+    base_ideas = [
+        f"Share a behind-the-scenes look at {topic}",
+        f"Create a tutorial about {topic}",
+        f"Ask your audience a question about {topic}",
+        f"Share tips and tricks related to {topic}",
+        f"Post inspirational quotes about {topic}",
+        f"Share user-generated content about {topic}",
+        f"Create a poll about {topic}",
+        f"Share industry news related to {topic}",
+        f"Post a carousel of {topic} facts",
+        f"Create a before/after post about {topic}"
+    ]
+
+    platform_specific = {
+        "facebook": " (optimize with longer text and links)",
+        "instagram": " (use high-quality visuals and hashtags)",
+        "both": " (adapt format for each platform)"
+    }
+
+    ideas_text = f"Content Ideas for '{topic}' ({platform}):\n"
+    for i, idea in enumerate(base_ideas[:max(args["count"], 0)], 1):
+        ideas_text += f"{i}. {idea}{platform_specific[platform]}\n"
+
+    return ideas_text
+
+
+@registry.tool(
+    "get_pages",
+    "Get list of Facebook pages managed by the user",
+    {"type": "object", "properties": {}, "required": []},
+    concurrency=4
+)
+async def get_pages(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    pages_text = "Your Facebook Pages:\n"
+    async for page in ctx.meta_api.iter_edge("me/accounts", fields="id,name", limit=100):
+        pages_text += f"- {page.get('name', 'Unknown')} (ID: {page.get('id', 'Unknown')})\n"
+
+    return pages_text
+
+
+@registry.tool(
+    "post_many",
+    "Publish many Facebook and Instagram posts concurrently and return per-post results",
+    {
+        "type": "object",
+        "properties": {
+            "posts": {
+                "type": "array",
+                "description": "Posts to publish; each has platform 'facebook' (page_id, message, link) or 'instagram' (instagram_account_id, image_url, caption)",
+                "maxItems": MAX_BULK_POSTS,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "platform": {"type": "string", "enum": ["facebook", "instagram"]},
+                        "page_id": {"type": "string"},
+                        "message": {"type": "string"},
+                        "link": {"type": "string"},
+                        "instagram_account_id": {"type": "string"},
+                        "image_url": {"type": "string"},
+                        "caption": {"type": "string"}
+                    },
+                    "required": ["platform"]
+                }
+            },
+            "concurrency": {"type": "integer", "description": "Maximum posts in flight at once",
+                            "default": DEFAULT_CONCURRENCY}
+        },
+        "required": ["posts"]
+    },
+    timeout=PUBLISH_TOOL_TIMEOUT,
+    concurrency=2
+)
+async def post_many(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    # Each page's access token is resolved once and shared by all of its posts
+    results = await publish_many(args["posts"], page_token_poster(ctx.meta_api), ctx.instagram_publisher,
+                                 concurrency=args["concurrency"], on_progress=ctx.on_progress)
+    return json.dumps(summarize(results), separators=(",", ":"))
+
+
+@registry.tool(
+    "get_insights_many",
+    "Get insights for many Facebook pages or Instagram accounts in one call (uses Graph batch requests)",
+    {
+        "type": "object",
+        "properties": {
+            "object_ids": {
+                "type": "array",
+                "items": {"type": "string"},
+                "maxItems": MAX_INSIGHT_TARGETS,
+                "description": "Facebook page or Instagram account IDs"
+            },
+            "metrics": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Metrics to fetch for every object (e.g. page_views, impressions)"
+            },
+            "period": {"type": "string", "description": "Time period (day, week, days_28)"},
+            "concurrency": {"type": "integer", "description": "Batch calls in flight at once (default 4)"}
+        },
+        "required": ["object_ids", "metrics"]
+    },
+    concurrency=2
+)
+async def get_insights_many(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    result = await insights_many(ctx.meta_api, args["object_ids"], args["metrics"],
+                                 period=args.get("period"), concurrency=args.get("concurrency"))
+    return json.dumps(result, separators=(",", ":"))
+
+
+@registry.tool(
+    "get_rate_limit_status",
+    "Get current Meta API usage budgets and any requests being held back",
+    {"type": "object", "properties": {}, "required": []}
+)
+async def get_rate_limit_status(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    return json.dumps(usage_governor.snapshot(), indent=2)
+
+
+@registry.tool(
+    "get_diagnostics",
+    "Get server diagnostics such as response cache hit ratios, connection pool metrics and per-tool latency",
+    {"type": "object", "properties": {}, "required": []}
+)
+async def get_diagnostics(ctx: ToolContext, args: Dict[str, Any]) -> str:
+    return json.dumps({
+        "response_cache": ctx.tool_cache.stats() if ctx.tool_cache else None,
+        "http_pool": ctx.meta_api.http_pool.metrics(),
+        "tools": registry.stats()
+    }, indent=2)
@@ -0,0 +1,284 @@
+"""
+Persistent outbox of scheduled posts (Supabase, or SQLite for local development)
+"""
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from bulk_publish import validate_post_spec
+
+# Post states
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_PUBLISHED = 'published'
+STATUS_FAILED = 'failed'
+
+MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '3'))
+
+# Workers renew their leases while publishing, so a lease only runs out if the worker died mid-batch.
+# Its posts may already be live, so they are failed for review instead of being published again.
+LEASE_EXPIRED_ERROR = 'Worker lease expired while publishing; check the page before rescheduling'
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def to_timestamp(value: Optional[Any]) -> str:
+    """Normalize a datetime or ISO 8601 string to a UTC ISO timestamp"""
+    if not value:
+        moment = utc_now()
+    elif isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        # Naive timestamps are taken to be UTC
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+
+def default_idempotency_key(spec: Dict[str, Any], scheduled_at: str) -> str:
+    """Content-addressed key, so resubmitting the same calendar entry is a no-op"""
+    canonical = json.dumps({'post': spec, 'scheduled_at': scheduled_at}, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def retry_time(attempts: int) -> str:
+    """When a failed post becomes due again: 1, 4, 16... minutes"""
+    return to_timestamp(utc_now() + timedelta(minutes=4 ** max(0, attempts - 1)))
+
+
+def prepare_post(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a scheduled post request and split it into outbox columns"""
+    post = {k: v for k, v in spec.items() if k not in ('scheduled_at', 'idempotency_key')}
+    error = validate_post_spec(post)
+    if error:
+        raise ValueError(error)
+    scheduled_at = to_timestamp(spec.get('scheduled_at'))
+    return {
+        'idempotency_key': spec.get('idempotency_key') or default_idempotency_key(post, scheduled_at),
+        'platform': post['platform'],
+        'payload': post,
+        'scheduled_at': scheduled_at
+    }
+
+
+class SQLiteOutbox:
+    """Outbox stored in a local SQLite file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('OUTBOX_DB_PATH', 'outbox.db')
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scheduled_posts (
+                    id TEXT PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    platform TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    scheduled_at TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    locked_by TEXT,
+                    locked_until TEXT,
+                    result_id TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS scheduled_posts_due_idx ON scheduled_posts (status, scheduled_at)')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        data['payload'] = json.loads(data['payload'])
+        return data
+
+    def enqueue(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a post; returns the existing row if its idempotency key was seen before"""
+        post = prepare_post(spec)
+        now = to_timestamp(utc_now())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO scheduled_posts '
+                '(id, idempotency_key, platform, payload, scheduled_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(uuid.uuid4()), post['idempotency_key'], post['platform'],
+                 json.dumps(post['payload']), post['scheduled_at'], now, now)
+            )
+            row = conn.execute('SELECT * FROM scheduled_posts WHERE idempotency_key = ?',
+                               (post['idempotency_key'],)).fetchone()
+        return self._row(row)
+
+    def claim_due(self, batch_size: int, worker_id: str, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Atomically lease up to batch_size due posts; expired leases are failed, not reclaimed"""
+        now = to_timestamp(utc_now())
+        locked_until = to_timestamp(utc_now() + timedelta(seconds=lease_seconds))
+        with self._lock, self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    "UPDATE scheduled_posts SET status = 'failed', error = ?, locked_by = NULL, locked_until = NULL, "
+                    "updated_at = ? WHERE status = 'processing' AND locked_until < ?",
+                    (LEASE_EXPIRED_ERROR, now, now)
+                )
+                rows = conn.execute(
+                    "SELECT id FROM scheduled_posts "
+                    "WHERE status = 'pending' AND scheduled_at <= ? AND attempts < ? "
+                    "ORDER BY scheduled_at LIMIT ?",
+                    (now, MAX_ATTEMPTS, batch_size)
+                ).fetchall()
+                ids = [row['id'] for row in rows]
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    conn.execute(
+                        f"UPDATE scheduled_posts SET status = 'processing', locked_by = ?, locked_until = ?, "
+                        f"attempts = attempts + 1, updated_at = ? WHERE id IN ({marks})",
+                        [worker_id, locked_until, now] + ids
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            claimed = conn.execute(
+                f"SELECT * FROM scheduled_posts WHERE id IN ({','.join('?' * len(ids))}) ORDER BY scheduled_at",
+                ids
+            ).fetchall() if ids else []
+        return [self._row(row) for row in claimed]
+
+    def renew_leases(self, post_ids: List[str], worker_id: str, lease_seconds: int):
+        """Extend this worker's leases on posts it is still publishing"""
+        if not post_ids:
+            return
+        locked_until = to_timestamp(utc_now() + timedelta(seconds=lease_seconds))
+        marks = ','.join('?' * len(post_ids))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE scheduled_posts SET locked_until = ? "
+                f"WHERE status = 'processing' AND locked_by = ? AND id IN ({marks})",
+                [locked_until, worker_id] + list(post_ids)
+            )
+
+    def _update(self, post_id: str, **changes):
+        changes['updated_at'] = to_timestamp(utc_now())
+        assignments = ', '.join(f"{column} = ?" for column in changes)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE scheduled_posts SET {assignments} WHERE id = ?", list(changes.values()) + [post_id])
+
+    def mark_published(self, post_id: str, result_id: Optional[str]):
+        self._update(post_id, status=STATUS_PUBLISHED, result_id=result_id, error=None,
+                     locked_by=None, locked_until=None)
+
+    def mark_failed(self, post_id: str, error: str, retry_at: Optional[str] = None):
+        """Record a failure; with retry_at the post becomes due again at that time"""
+        if retry_at:
+            self._update(post_id, status=STATUS_PENDING, scheduled_at=retry_at, error=error,
+                         locked_by=None, locked_until=None)
+        else:
+            self._update(post_id, status=STATUS_FAILED, error=error, locked_by=None, locked_until=None)
+
+    def list_posts(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query = 'SELECT * FROM scheduled_posts'
+        params: List[Any] = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY scheduled_at LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            return [self._row(row) for row in conn.execute(query, params).fetchall()]
+
+
+class SupabaseOutbox:
+    """Outbox stored in the Supabase scheduled_posts table (see supabase_setup.sql)"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.client = manager.client
+
+    def enqueue(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a post; returns the existing row if its idempotency key was seen before"""
+        post = prepare_post(spec)
+        self.manager._execute(
+            self.client.table('scheduled_posts').upsert(
+                post, on_conflict='idempotency_key', ignore_duplicates=True
+            )
+        )
+        response = self.manager._execute(
+            self.client.table('scheduled_posts').select('*').eq('idempotency_key', post['idempotency_key'])
+        )
+        return response.data[0]
+
+    def claim_due(self, batch_size: int, worker_id: str, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease due posts with FOR UPDATE SKIP LOCKED via the claim_scheduled_posts function"""
+        response = self.manager._execute(self.client.rpc('claim_scheduled_posts', {
+            'batch_size': batch_size,
+            'worker': worker_id,
+            'lease_seconds': lease_seconds,
+            'max_attempts': MAX_ATTEMPTS,
+            'expired_error': LEASE_EXPIRED_ERROR
+        }), idempotent=False)
+        return response.data or []
+
+    def renew_leases(self, post_ids: List[str], worker_id: str, lease_seconds: int):
+        """Extend this worker's leases on posts it is still publishing"""
+        if not post_ids:
+            return
+        self.manager._execute(
+            self.client.table('scheduled_posts')
+            .update({'locked_until': to_timestamp(utc_now() + timedelta(seconds=lease_seconds))})
+            .in_('id', list(post_ids)).eq('locked_by', worker_id).eq('status', STATUS_PROCESSING)
+        )
+
+    def _update(self, post_id: str, **changes):
+        changes['updated_at'] = to_timestamp(utc_now())
+        self.manager._execute(self.client.table('scheduled_posts').update(changes).eq('id', post_id))
+
+    def mark_published(self, post_id: str, result_id: Optional[str]):
+        self._update(post_id, status=STATUS_PUBLISHED, result_id=result_id, error=None,
+                     locked_by=None, locked_until=None)
+
+    def mark_failed(self, post_id: str, error: str, retry_at: Optional[str] = None):
+        """Record a failure; with retry_at the post becomes due again at that time"""
+        if retry_at:
+            self._update(post_id, status=STATUS_PENDING, scheduled_at=retry_at, error=error,
+                         locked_by=None, locked_until=None)
+        else:
+            self._update(post_id, status=STATUS_FAILED, error=error, locked_by=None, locked_until=None)
+
+    def list_posts(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query = self.client.table('scheduled_posts').select('*').order('scheduled_at').limit(limit)
+        if status:
+            query = query.eq('status', status)
+        return self.manager._execute(query).data or []
+
+
+def get_outbox():
+    """Supabase outbox when configured (unless OUTBOX_BACKEND=sqlite), else SQLite"""
+    backend = os.getenv('OUTBOX_BACKEND', 'auto').lower()
+    if backend != 'sqlite':
+        from supabase_client import supabase_manager
+        if supabase_manager.is_available():
+            return SupabaseOutbox(supabase_manager)
+        if backend == 'supabase':
+            raise RuntimeError('OUTBOX_BACKEND=supabase but Supabase is not configured')
+    logging.info("Using SQLite outbox")
+    return SQLiteOutbox()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Scheduled post worker - publishes due posts from the outbox
+
+Usage:
+    python outbox_worker.py            # run continuously
+    python outbox_worker.py --once     # publish everything due now, then exit
+"""
+
+import os
+import sys
+import socket
+import asyncio
+import argparse
+import logging
+from typing import Any, Dict, List
+
+from simple_server import MetaAPI
+from publish_jobs import InstagramPublisher
+from bulk_publish import publish_many, page_token_poster
+from outbox import get_outbox, retry_time, MAX_ATTEMPTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    def __init__(self, outbox, batch_size: int, concurrency: int, lease_seconds: int):
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.meta_api = MetaAPI()
+        self.publisher = InstagramPublisher(self.meta_api.make_api_request)
+
+    async def process_batch(self) -> int:
+        """Claim one batch of due posts, publish it and record the results"""
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(
+            None, self.outbox.claim_due, self.batch_size, self.worker_id, self.lease_seconds
+        )
+        if not rows:
+            return 0
+
+        # Page tokens are resolved once per batch and shared by every post in it
+        post_to_feed = page_token_poster(self.meta_api)
+
+        # Keep the batch leased while it publishes (Instagram processing can outlast a single lease)
+        heartbeat = asyncio.create_task(self.renew_leases([row['id'] for row in rows]))
+        try:
+            results = await publish_many([row['payload'] for row in rows], post_to_feed, self.publisher,
+                                         concurrency=self.concurrency)
+        finally:
+            heartbeat.cancel()
+        await loop.run_in_executor(None, self.record_results, rows, results)
+        return len(rows)
+
+    async def renew_leases(self, post_ids: List[str]):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(1.0, self.lease_seconds / 3))
+            try:
+                await loop.run_in_executor(
+                    None, self.outbox.renew_leases, post_ids, self.worker_id, self.lease_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Could not renew outbox leases: {e}")
+
+    def record_results(self, rows: List[Dict[str, Any]], results: List[Dict[str, Any]]):
+        for row, result in zip(rows, results):
+            if result.get('success'):
+                self.outbox.mark_published(row['id'], result.get('id'))
+                logger.info(f"Published scheduled post {row['id']} ({row['platform']})")
+            elif result.get('retry_safe') and row['attempts'] < MAX_ATTEMPTS:
+                self.outbox.mark_failed(row['id'], result.get('error'), retry_at=retry_time(row['attempts']))
+                logger.warning(f"Scheduled post {row['id']} will be retried: {result.get('error')}")
+            else:
+                self.outbox.mark_failed(row['id'], result.get('error'))
+                logger.error(f"Scheduled post {row['id']} failed: {result.get('error')}")
+
+    async def run(self, once: bool = False, interval: float = 30):
+        """Publish due posts until stopped (or, with once, until nothing is due)"""
+        try:
+            while True:
+                processed = await self.process_batch()
+                if processed:
+                    continue
+                if once:
+                    break
+                await asyncio.sleep(interval)
+        finally:
+            await self.meta_api.close_session()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish scheduled posts from the outbox")
+    parser.add_argument('--once', action='store_true', help="Publish everything due now, then exit")
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('OUTBOX_BATCH_SIZE', '25')))
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('OUTBOX_CONCURRENCY', '8')))
+    parser.add_argument('--interval', type=float, default=float(os.getenv('OUTBOX_POLL_INTERVAL', '30')),
+                        help="Seconds to sleep when nothing is due")
+    parser.add_argument('--lease', type=int, default=int(os.getenv('OUTBOX_LEASE_SECONDS', '600')),
+                        help="Seconds a claimed post stays locked to this worker")
+    args = parser.parse_args()
+
+    worker = OutboxWorker(get_outbox(), args.batch_size, args.concurrency, args.lease)
+    try:
+        asyncio.run(worker.run(once=args.once, interval=args.interval))
+    except KeyboardInterrupt:
+        logger.info("Outbox worker stopped")
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
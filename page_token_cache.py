@@ -0,0 +1,105 @@
+"""
+TTL cache for page access tokens returned by me/accounts
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from meta_errors import MetaAPIError
+
+
+class PageTokenCache:
+    """Cache of me/accounts results keyed by the user access token.
+
+    Entries expire after `ttl` seconds. Reads inside the final
+    `refresh_margin` seconds still return the cached pages but start a
+    background refresh, so callers rarely wait on a list-pages round trip.
+    """
+
+    def __init__(self, fetch_pages: Callable[[str], List[Dict[str, Any]]],
+                 ttl: Optional[float] = None, refresh_margin: Optional[float] = None):
+        self.fetch_pages = fetch_pages
+        self.ttl = ttl if ttl is not None else float(os.getenv('PAGE_TOKEN_CACHE_TTL', '900'))
+        self.refresh_margin = (refresh_margin if refresh_margin is not None
+                               else float(os.getenv('PAGE_TOKEN_REFRESH_MARGIN', '120')))
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_token: str) -> str:
+        # Avoid keeping raw tokens as dictionary keys
+        return hashlib.sha256(user_token.encode('utf-8')).hexdigest()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_pages(self, user_token: str) -> List[Dict[str, Any]]:
+        """Return the pages for a user token, fetching only on miss or expiry"""
+        key = self._key(user_token)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+
+        if entry and now < entry['expires_at']:
+            if now >= entry['expires_at'] - self.refresh_margin:
+                self._schedule_refresh(key, user_token)
+            return entry['pages']
+
+        # Only one thread loads a given token; the others wait for its result
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry and time.monotonic() < entry['expires_at']:
+                return entry['pages']
+            return self._load(key, user_token)
+
+    def get_page_token(self, user_token: str, page_id: str) -> Optional[str]:
+        """Return the access token for one page, or None if the user can't manage it"""
+        for page in self.get_pages(user_token):
+            if page.get('id') == page_id:
+                return page.get('access_token')
+        return None
+
+    def invalidate(self, user_token: Optional[str] = None):
+        """Drop the cached pages for one user token, or everything"""
+        with self._lock:
+            if user_token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(user_token), None)
+
+    def _load(self, key: str, user_token: str) -> List[Dict[str, Any]]:
+        try:
+            pages = self.fetch_pages(user_token)
+        except MetaAPIError as e:
+            if e.is_token_error:
+                self._entries.pop(key, None)
+            raise
+        self._entries[key] = {
+            'pages': pages,
+            'expires_at': time.monotonic() + self.ttl
+        }
+        return pages
+
+    def _schedule_refresh(self, key: str, user_token: str):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._load(key, user_token)
+            except Exception as e:
+                # Keep serving the current entry until it expires
+                logging.warning(f"Background page token refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='page-token-refresh', daemon=True).start()
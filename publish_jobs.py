@@ -0,0 +1,210 @@
+"""
+Asynchronous Instagram publish pipeline with container status polling
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+# Container status codes returned by GET /{container-id}?fields=status_code
+CONTAINER_FINISHED = 'FINISHED'
+CONTAINER_FAILED = ('ERROR', 'EXPIRED')
+
+# Job states, in pipeline order
+JOB_QUEUED = 'queued'
+JOB_CREATING = 'creating_container'
+JOB_PROCESSING = 'processing'
+JOB_PUBLISHING = 'publishing'
+JOB_PUBLISHED = 'published'
+JOB_FAILED = 'failed'
+
+# Progress steps reported by run_job: container created, processed, published
+PUBLISH_STEPS = 3
+
+ApiRequest = Callable[[str, str, Optional[dict]], Awaitable[Dict[str, Any]]]
+# async (progress, total, message) callback, e.g. an MCP progress notification
+ProgressCallback = Callable[[float, Optional[float], str], Awaitable[None]]
+
+
+class InstagramPublisher:
+    """Runs Instagram publishes as jobs: create container, poll, publish.
+
+    `api_request` is an async (endpoint, method, data) -> dict callable, so
+    the same pipeline runs on the aiohttp MCP clients and, through
+    BackgroundLoop, on the synchronous Flask MetaAPI. Container polling uses
+    growing intervals and never blocks the event loop, so many publishes
+    progress concurrently.
+    """
+
+    def __init__(self, api_request: ApiRequest):
+        self.api_request = api_request
+        self.poll_interval = float(os.getenv('IG_POLL_INTERVAL', '1'))
+        self.max_poll_interval = float(os.getenv('IG_MAX_POLL_INTERVAL', '10'))
+        self.processing_timeout = float(os.getenv('IG_PROCESSING_TIMEOUT', '300'))
+        self.max_jobs = int(os.getenv('IG_MAX_TRACKED_JOBS', '1000'))
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Background job tasks; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def create_job(self, instagram_account_id: str, image_url: Optional[str] = None,
+                   caption: str = '', video_url: Optional[str] = None,
+                   media_type: Optional[str] = None) -> Dict[str, Any]:
+        """Register a new publish job without starting it"""
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': JOB_QUEUED,
+            'instagram_account_id': instagram_account_id,
+            'image_url': image_url,
+            'video_url': video_url,
+            'media_type': media_type,
+            'caption': caption,
+            'creation_id': None,
+            'container_status': None,
+            'media_id': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        with self._lock:
+            self.jobs[job['id']] = job
+            self._prune()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job; jobs are updated from the background loop thread"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [dict(job) for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+    def _prune(self):
+        # Drop the oldest finished jobs once the registry is full
+        if len(self.jobs) <= self.max_jobs:
+            return
+        finished = sorted(
+            (job for job in self.jobs.values() if job['status'] in (JOB_PUBLISHED, JOB_FAILED)),
+            key=lambda job: job['updated_at']
+        )
+        for job in finished[:len(self.jobs) - self.max_jobs]:
+            del self.jobs[job['id']]
+
+    def _update(self, job: Dict[str, Any], **changes):
+        with self._lock:
+            job.update(changes)
+            job['updated_at'] = time.time()
+
+    def start_job(self, job: Dict[str, Any]) -> asyncio.Task:
+        """Run a job in the background on the running loop, holding a reference until it finishes"""
+        task = asyncio.get_running_loop().create_task(self.run_job(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_job(self, job: Dict[str, Any], on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Drive a job through container creation, processing and publishing"""
+        async def report(progress: float, message: str):
+            if on_progress:
+                await on_progress(progress, PUBLISH_STEPS, message)
+
+        try:
+            self._update(job, status=JOB_CREATING)
+            await report(0, "Creating media container")
+            container_data = {'caption': job['caption']}
+            if job['video_url']:
+                container_data['video_url'] = job['video_url']
+                container_data['media_type'] = job['media_type'] or 'REELS'
+            else:
+                container_data['image_url'] = job['image_url']
+            container = await self.api_request(f"{job['instagram_account_id']}/media", "POST", container_data)
+            self._update(job, creation_id=container.get('id'), status=JOB_PROCESSING)
+            await report(1, f"Container {job['creation_id']} created")
+
+            await self._wait_until_ready(job, report)
+
+            self._update(job, status=JOB_PUBLISHING)
+            await report(2, "Media processed; publishing")
+            published = await self.api_request(
+                f"{job['instagram_account_id']}/media_publish", "POST", {'creation_id': job['creation_id']}
+            )
+            self._update(job, status=JOB_PUBLISHED, media_id=published.get('id'))
+            await report(3, f"Published media {job['media_id']}")
+        except asyncio.CancelledError:
+            self._update(job, status=JOB_FAILED, error='Cancelled before publishing finished')
+            raise
+        except Exception as e:
+            logging.error(f"Instagram publish job {job['id']} failed: {e}")
+            self._update(job, status=JOB_FAILED, error=str(e))
+        return job
+
+    async def _wait_until_ready(self, job: Dict[str, Any], report: Callable[[float, str], Awaitable[None]]):
+        interval = self.poll_interval
+        give_up_at = time.monotonic() + self.processing_timeout
+        polls = 0
+        while True:
+            container = await self.api_request(job['creation_id'], "GET", {'fields': 'status_code,status'})
+            status_code = container.get('status_code')
+            self._update(job, container_status=status_code)
+
+            if status_code == CONTAINER_FINISHED:
+                return
+            if status_code in CONTAINER_FAILED:
+                raise Exception(f"Media container {status_code.lower()}: {container.get('status', 'no details')}")
+            if time.monotonic() + interval > give_up_at:
+                raise Exception(f"Media container still {status_code or 'processing'} after {int(self.processing_timeout)}s")
+
+            # Processing time is unknown, so progress creeps towards the next step
+            polls += 1
+            await report(1 + polls / (polls + 1), f"Container {status_code or 'processing'} (check {polls})")
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+    async def publish(self, instagram_account_id: str, image_url: Optional[str] = None,
+                      caption: str = '', video_url: Optional[str] = None,
+                      media_type: Optional[str] = None,
+                      on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Create and run a job to completion (for async callers)"""
+        job = self.create_job(instagram_account_id, image_url, caption, video_url, media_type)
+        return await self.run_job(job, on_progress)
+
+
+class BackgroundLoop:
+    """An asyncio event loop on a daemon thread, for scheduling work from Flask"""
+
+    def __init__(self, name: str = 'background-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop and return a thread-safe future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def wrap_sync(self, func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        """Expose a blocking function as a coroutine that runs in the default executor"""
+        async def call(*args):
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        return call
+
+
+# Global instance used by the Flask app
+background_loop = BackgroundLoop()
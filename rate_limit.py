@@ -0,0 +1,181 @@
+"""
+Adaptive rate-limit governor driven by Meta's usage headers
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from meta_errors import MetaAPIError
+
+# Meta's usage percentages are measured over a rolling one-hour window
+USAGE_WINDOW_SECONDS = 3600
+
+APP_SCOPE = 'app'
+
+
+def object_id_for(endpoint: str) -> Optional[str]:
+    """Return the page/account ID an endpoint is billed against, if any"""
+    head = endpoint.strip('/').split('/', 1)[0]
+    # Post IDs look like {page_id}_{post_id}
+    head = head.split('_', 1)[0]
+    return head if head.isdigit() else None
+
+
+class UsageGovernor:
+    """Tracks X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage budgets.
+
+    Every response updates the usage of the app and of the page it touched.
+    Before a request is sent, `delay_for` turns the current usage into a
+    wait: nothing below `soft_limit`, a growing pause between the soft and
+    hard limits, and a hold until Meta's regain estimate once a budget is
+    exhausted. Waits longer than `max_wait` fail fast instead of tying up a
+    worker.
+    """
+
+    def __init__(self):
+        self.soft_limit = float(os.getenv('META_USAGE_SOFT_LIMIT', '75'))
+        self.hard_limit = float(os.getenv('META_USAGE_HARD_LIMIT', '95'))
+        self.max_pace_delay = float(os.getenv('META_USAGE_MAX_PACE_DELAY', '2'))
+        self.max_wait = float(os.getenv('META_USAGE_MAX_WAIT', '10'))
+        self.default_block = float(os.getenv('META_THROTTLE_BLOCK_SECONDS', '60'))
+        self._scopes: Dict[str, Dict[str, Any]] = {}
+        self._throttled_requests = 0
+        self._lock = threading.Lock()
+
+    # Recording
+
+    def record(self, headers, object_id: Optional[str] = None):
+        """Update budgets from the usage headers of a Graph response"""
+        app_usage = _parse_header(headers.get('X-App-Usage'))
+        if app_usage:
+            self._update(APP_SCOPE, _max_usage(app_usage))
+
+        page_usage = _parse_header(headers.get('X-Page-Usage'))
+        if page_usage and object_id:
+            self._update(object_id, _max_usage(page_usage))
+
+        buc_usage = _parse_header(headers.get('X-Business-Use-Case-Usage'))
+        if buc_usage:
+            # Keyed by the business object (page) ID, one entry per use case type
+            for scope_id, entries in buc_usage.items():
+                for entry in entries or []:
+                    regain = entry.get('estimated_time_to_regain_access') or 0
+                    self._update(scope_id, _max_usage(entry), regain_minutes=regain)
+
+    def record_throttle(self, error: MetaAPIError, object_id: Optional[str] = None):
+        """Block the affected budget after Meta rejected a call as throttled"""
+        scope = object_id if error.code in (32, 80001) and object_id else APP_SCOPE
+        with self._lock:
+            state = self._scopes.setdefault(scope, {'usage': 0.0, 'updated': time.time(), 'blocked_until': 0.0})
+            state['usage'] = 100.0
+            state['updated'] = time.time()
+            state['blocked_until'] = max(state['blocked_until'], time.time() + self.default_block)
+        logging.warning(f"Meta throttled {scope} (code {error.code}); holding requests")
+
+    def _update(self, scope: str, usage: float, regain_minutes: float = 0):
+        now = time.time()
+        with self._lock:
+            state = self._scopes.setdefault(scope, {'usage': 0.0, 'updated': now, 'blocked_until': 0.0})
+            state['usage'] = usage
+            state['updated'] = now
+            if regain_minutes:
+                state['blocked_until'] = max(state['blocked_until'], now + regain_minutes * 60)
+
+    # Pacing
+
+    def _estimated_usage(self, state: Dict[str, Any], now: float) -> float:
+        # Usage drains as old calls leave the rolling window
+        drained = (now - state['updated']) / USAGE_WINDOW_SECONDS * 100
+        return max(0.0, state['usage'] - drained)
+
+    def _scope_delay(self, state: Dict[str, Any], now: float) -> float:
+        if state['blocked_until'] > now:
+            return state['blocked_until'] - now
+
+        usage = self._estimated_usage(state, now)
+        if usage < self.soft_limit:
+            return 0.0
+        if usage >= self.hard_limit:
+            # Hold until enough of the window has drained to get back under the hard limit
+            return (usage - self.hard_limit) / 100 * USAGE_WINDOW_SECONDS + self.max_pace_delay
+        fraction = (usage - self.soft_limit) / (self.hard_limit - self.soft_limit)
+        return fraction * self.max_pace_delay
+
+    def delay_for(self, object_id: Optional[str] = None) -> float:
+        """Seconds to wait before sending a request billed to `object_id`"""
+        now = time.time()
+        with self._lock:
+            delays = [self._scope_delay(state, now) for scope, state in self._scopes.items()
+                      if scope in (APP_SCOPE, object_id)]
+        return max(delays, default=0.0)
+
+    def _check_delay(self, object_id: Optional[str]) -> float:
+        delay = self.delay_for(object_id)
+        if delay > self.max_wait:
+            with self._lock:
+                self._throttled_requests += 1
+            raise MetaAPIError(
+                f"Rate limit budget exhausted for {object_id or 'app'}; retry in {int(delay)}s",
+                code=4
+            )
+        return delay
+
+    def wait(self, object_id: Optional[str] = None):
+        """Block the calling thread until a request may be sent"""
+        delay = self._check_delay(object_id)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_slot(self, object_id: Optional[str] = None):
+        """Async version of wait for the aiohttp-based clients"""
+        delay = self._check_delay(object_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # Monitoring
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current budgets, for status endpoints and diagnostics tools"""
+        now = time.time()
+        with self._lock:
+            scopes = {
+                scope: {
+                    'usage': round(self._estimated_usage(state, now), 1),
+                    'reported_usage': state['usage'],
+                    'blocked_for': round(max(0.0, state['blocked_until'] - now), 1),
+                    'delay': round(self._scope_delay(state, now), 2)
+                }
+                for scope, state in self._scopes.items()
+            }
+            throttled = self._throttled_requests
+        return {
+            'soft_limit': self.soft_limit,
+            'hard_limit': self.hard_limit,
+            'rejected_locally': throttled,
+            'scopes': scopes
+        }
+
+
+def _parse_header(value: Optional[str]) -> Optional[Any]:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _max_usage(usage: Dict[str, Any]) -> float:
+    return float(max(
+        usage.get('call_count', 0) or 0,
+        usage.get('total_cputime', 0) or 0,
+        usage.get('total_time', 0) or 0
+    ))
+
+
+# Global instance shared by every Meta client in the process
+usage_governor = UsageGovernor()
@@ -0,0 +1,335 @@
+"""
+Retries, deadlines and circuit breakers for Meta, OpenAI and Supabase calls
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from meta_errors import MetaAPIError
+
+
+def library_errors() -> Tuple[Tuple[Type[BaseException], ...], Tuple[Type[BaseException], ...]]:
+    """(connect, transient) error types, including those of the HTTP client libraries in use.
+
+    Connect errors were raised before the request reached the remote service,
+    so they are safe to retry even for writes; after a transient error the
+    request may or may not have been processed. Client libraries are only
+    looked up in sys.modules, never imported here: one that was never loaded
+    can't have raised the error, and importing openai alone costs the MCP
+    servers half a second of startup.
+    """
+    connect: Tuple[Type[BaseException], ...] = (ConnectionRefusedError,)
+    transient: Tuple[Type[BaseException], ...] = (TimeoutError, asyncio.TimeoutError, ConnectionError)
+
+    requests = sys.modules.get('requests')
+    if requests is not None:
+        connect += (requests.exceptions.ConnectTimeout,)
+        transient += (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+    aiohttp = sys.modules.get('aiohttp')
+    if aiohttp is not None:
+        connect += (aiohttp.ClientConnectorError,)
+        transient += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+    httpx = sys.modules.get('httpx')
+    if httpx is not None:
+        connect += (httpx.ConnectError, httpx.ConnectTimeout)
+        transient += (httpx.TransportError,)
+
+    openai = sys.modules.get('openai')
+    if openai is not None:
+        transient += (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+    return connect, transient
+
+# Graph error codes documented as temporary ("unknown error", "service unavailable")
+RETRYABLE_META_CODES = {1, 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the dependency while its circuit breaker is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the route's time budget runs out before a call can be made"""
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """True if the error means the dependency itself is failing (timeout, connection error, 5xx),
+    whether or not the call is safe to retry; these count towards its circuit breaker"""
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False
+    connect_errors, transient_errors = library_errors()
+    if isinstance(error, connect_errors):
+        return True
+    if isinstance(error, MetaAPIError):
+        return (error.status or 0) >= 500 or error.code in RETRYABLE_META_CODES
+    return isinstance(error, transient_errors)
+
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """Classify an error as transient (retry) or fatal (raise immediately)"""
+    if not is_dependency_failure(error):
+        return False
+    connect_errors, _ = library_errors()
+    if isinstance(error, connect_errors):
+        return True
+    # A write that timed out or got a 5xx may already have been applied
+    return idempotent
+
+
+# Deadlines
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('deadline', default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current deadline, or None when no deadline is set"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def start_deadline(seconds: float) -> contextvars.Token:
+    """Start a deadline for the current request; pass the token to end_deadline"""
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds
+    if current is not None:
+        deadline = min(deadline, current)
+    return _deadline.set(deadline)
+
+
+def end_deadline(token: contextvars.Token):
+    """Restore the deadline that was active before start_deadline"""
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Context manager form of start_deadline/end_deadline"""
+    token = start_deadline(seconds)
+    try:
+        yield
+    finally:
+        end_deadline(token)
+
+
+# Circuit breaker
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures of one dependency.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls raise CircuitOpenError for `reset_timeout` seconds. The first call
+    after that is let through as a probe: success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be attempted now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        raise CircuitOpenError(f"{self.name} is temporarily unavailable, please try again shortly")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Let another call probe a half-open circuit; for calls that ended without an outcome (cancelled)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probe_in_flight:
+                    logging.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'state': self.state, 'failures': self.failures}
+
+
+# Retries
+
+class RetryPolicy:
+    """Bounded exponential backoff with full jitter"""
+
+    def __init__(self, attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None):
+        self.attempts = attempts or int(os.getenv('RETRY_ATTEMPTS', '3'))
+        self.base_delay = base_delay or float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+        self.max_delay = max_delay or float(os.getenv('RETRY_MAX_DELAY', '4'))
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+default_policy = RetryPolicy()
+
+
+def _attempt_timeout(timeout: Optional[float]) -> Optional[float]:
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _set_attempt_timeout(kwargs: Dict[str, Any], timeout_arg: str):
+    """Cap the timeout keyword to the deadline; leave it unset when there is neither"""
+    timeout = _attempt_timeout(kwargs.get(timeout_arg))
+    if timeout is None:
+        kwargs.pop(timeout_arg, None)
+    else:
+        kwargs[timeout_arg] = timeout
+
+
+def _record_outcome(breaker: Optional[CircuitBreaker], error: BaseException):
+    if breaker is None:
+        return
+    if is_dependency_failure(error):
+        breaker.record_failure()
+    else:
+        # The dependency answered (e.g. a 4xx); the call failed but the service is up
+        breaker.record_success()
+
+
+def _next_delay(policy: RetryPolicy, attempt: int) -> Optional[float]:
+    """Backoff before the next attempt, or None if there is no time left to retry"""
+    if attempt >= policy.attempts:
+        return None
+    delay = policy.backoff(attempt)
+    remaining = remaining_time()
+    if remaining is not None and delay >= remaining:
+        return None
+    return delay
+
+
+def call_with_retry(func: Callable[..., Any], *args, breaker: Optional[CircuitBreaker] = None,
+                    policy: Optional[RetryPolicy] = None, idempotent: bool = True,
+                    timeout_arg: Optional[str] = None, **kwargs) -> Any:
+    """Call `func`, retrying transient errors within the current deadline.
+
+    When `timeout_arg` is given, that keyword argument is capped to the time
+    left in the deadline on every attempt.
+    """
+    policy = policy or default_policy
+    attempt = 0
+    while True:
+        attempt += 1
+        if timeout_arg:
+            _set_attempt_timeout(kwargs, timeout_arg)
+        elif remaining_time() is not None and remaining_time() <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        if breaker:
+            breaker.before_call()
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            _record_outcome(breaker, e)
+            retryable = is_retryable(e, idempotent)
+            delay = _next_delay(policy, attempt) if retryable else None
+            if delay is None:
+                raise
+            logging.warning(f"Retrying after transient error (attempt {attempt}): {e}")
+            time.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled or interrupted: there is no outcome to record, but a half-open probe must be released
+            if breaker:
+                breaker.release_probe()
+            raise
+
+        if breaker:
+            breaker.record_success()
+        return result
+
+
+async def acall_with_retry(func: Callable[..., Any], *args, breaker: Optional[CircuitBreaker] = None,
+                           policy: Optional[RetryPolicy] = None, idempotent: bool = True,
+                           timeout_arg: Optional[str] = None, **kwargs) -> Any:
+    """Async version of call_with_retry for coroutine functions"""
+    policy = policy or default_policy
+    attempt = 0
+    while True:
+        attempt += 1
+        if timeout_arg:
+            _set_attempt_timeout(kwargs, timeout_arg)
+        elif remaining_time() is not None and remaining_time() <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        if breaker:
+            breaker.before_call()
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            _record_outcome(breaker, e)
+            retryable = is_retryable(e, idempotent)
+            delay = _next_delay(policy, attempt) if retryable else None
+            if delay is None:
+                raise
+            logging.warning(f"Retrying after transient error (attempt {attempt}): {e}")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled or interrupted: there is no outcome to record, but a half-open probe must be released
+            if breaker:
+                breaker.release_probe()
+            raise
+
+        if breaker:
+            breaker.record_success()
+        return result
+
+
+# One breaker per dependency, shared by every client in the process
+breakers = {
+    'meta': CircuitBreaker('Meta Graph API'),
+    'openai': CircuitBreaker('OpenAI'),
+    'supabase': CircuitBreaker('Supabase'),
+}
+
+
+def breaker_status() -> Dict[str, Dict[str, Any]]:
+    """Circuit breaker states, for status endpoints"""
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
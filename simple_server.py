@@ -6,124 +6,170 @@ Compatible with Python 3.9+
 
 import asyncio
 import json
-import sys
 import os
-from typing import Any, Dict, List, Optional
-import aiohttp
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aio_http import AsyncHTTPPool
 from dotenv import load_dotenv
+from graph_paging import aiter_edge
+from meta_errors import MetaAPIError
+from rate_limit import usage_governor, object_id_for
+from resilience import acall_with_retry, breakers, CircuitOpenError, DeadlineExceeded
+from publish_jobs import InstagramPublisher, ProgressCallback
+from stdio_transport import StdioTransport
+from tool_cache import ToolCache
+from tool_registry import ToolInputError
+from meta_tools import registry, ToolContext
 
 # Load environment variables
 load_dotenv()
 
+# Most requests handled concurrently by main() before it stops reading stdin
+MAX_IN_FLIGHT = int(os.getenv('MCP_MAX_IN_FLIGHT', '16'))
+
 class MetaAPI:
     def __init__(self):
         self.app_id = os.getenv('META_APP_ID', '1667446050583846')
         self.access_token = os.getenv('META_ACCESS_TOKEN', '')
         self.base_url = 'https://graph.facebook.com/v18.0'
+        self.http_pool = AsyncHTTPPool()
         self.session = None
         
     async def initialize_session(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        self.session = await self.http_pool.get_session()
     
     async def close_session(self):
-        if self.session:
-            await self.session.close()
+        await self.http_pool.close()
+        self.session = None
     
-    async def make_api_request(self, endpoint: str, method: str = 'GET', data: dict = None) -> dict:
+    async def make_api_request(self, endpoint: str, method: str = 'GET', data: dict = None,
+                               access_token: str = None) -> dict:
+        try:
+            return await acall_with_retry(
+                self._send, endpoint, method, data, access_token,
+                breaker=breakers['meta'], idempotent=(method == 'GET'), timeout_arg='timeout'
+            )
+        except (MetaAPIError, CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise Exception(f"Request failed: {str(e)}")
+    
+    async def _send(self, endpoint: str, method: str, data: dict, access_token: str = None,
+                    timeout: float = None) -> dict:
         await self.initialize_session()
         
         url = f"{self.base_url}/{endpoint}"
-        params = {'access_token': self.access_token}
+        params = {'access_token': access_token or self.access_token}
         
         if method == 'GET' and data:
             params.update(data)
             data = None
         
-        try:
-            async with self.session.request(method, url, params=params, data=data) as response:
-                result = await response.json()
-                if response.status >= 400:
-                    raise Exception(f"Meta API Error: {result.get('error', {}).get('message', 'Unknown error')}")
-                return result
-        except Exception as e:
-            raise Exception(f"Request failed: {str(e)}")
+        object_id = object_id_for(endpoint)
+        await usage_governor.await_slot(object_id)
+        
+        request_timeout = self.http_pool.timeout(timeout)
+        async with self.session.request(method, url, params=params, data=data, timeout=request_timeout) as response:
+            usage_governor.record(response.headers, object_id)
+            status = response.status
+            try:
+                result = await response.json(content_type=None)
+            except ValueError:
+                if status < 400:
+                    raise
+                result = {}
+        
+        if status >= 400:
+            error = MetaAPIError.from_response(status, result)
+            if error.is_throttle_error:
+                usage_governor.record_throttle(error, object_id)
+            raise error
+        return result
+
+    def iter_edge(self, endpoint: str, fields: str = None, limit: int = None, params: dict = None):
+        """Lazily yield every row of an edge, following paging cursors"""
+        return aiter_edge(self.make_api_request, endpoint, fields=fields, limit=limit, params=params)
+
+def invalid_request(message: str) -> Dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": None,
+        "error": {
+            "code": -32600,
+            "message": f"Invalid request: {message}"
+        }
+    }
 
 class SimpleMCPServer:
-    def __init__(self):
+    def __init__(self, notify: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None):
         self.meta_api = MetaAPI()
-        self.tools = {
-            "post_to_facebook_page": {
-                "description": "Post content to a Facebook page",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "page_id": {"type": "string", "description": "Facebook page ID"},
-                        "message": {"type": "string", "description": "Text content to post"},
-                        "link": {"type": "string", "description": "Optional URL to include in post"}
-                    },
-                    "required": ["page_id", "message"]
-                }
-            },
-            "post_to_instagram": {
-                "description": "Post content to Instagram (requires Instagram Business Account)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "instagram_account_id": {"type": "string", "description": "Instagram Business Account ID"},
-                        "image_url": {"type": "string", "description": "URL of image to post"},
-                        "caption": {"type": "string", "description": "Caption for the Instagram post"}
-                    },
-                    "required": ["instagram_account_id", "image_url"]
-                }
-            },
-            "get_facebook_page_insights": {
-                "description": "Get analytics/insights for a Facebook page",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "page_id": {"type": "string", "description": "Facebook page ID"},
-                        "metric": {"type": "string", "description": "Metric to retrieve", "default": "page_views"},
-                        "period": {"type": "string", "description": "Time period", "default": "day"}
-                    },
-                    "required": ["page_id"]
-                }
-            },
-            "get_instagram_insights": {
-                "description": "Get analytics/insights for Instagram posts",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "instagram_account_id": {"type": "string", "description": "Instagram Business Account ID"},
-                        "metric": {"type": "string", "description": "Metric to retrieve", "default": "impressions"}
-                    },
-                    "required": ["instagram_account_id"]
-                }
-            },
-            "generate_content_ideas": {
-                "description": "Generate content ideas based on a topic or theme",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "topic": {"type": "string", "description": "Topic or theme for content ideas"},
-                        "platform": {"type": "string", "description": "Platform to optimize for", "default": "both"},
-                        "count": {"type": "integer", "description": "Number of ideas to generate", "default": 5}
-                    },
-                    "required": ["topic"]
-                }
-            },
-            "get_pages": {
-                "description": "Get list of Facebook pages managed by the user",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            }
-        }
+        self.instagram_publisher = InstagramPublisher(self.meta_api.make_api_request)
+        self.tool_cache = ToolCache()
+        # The tool list never changes, so the tools/list payload is built once
+        self.tools_list = registry.list_tools()
+        # Sends a notification to the client (progress); None when there is no channel back
+        self.notify = notify
+        # In-flight tools/call tasks by request id, for notifications/cancelled
+        self.calls: Dict[Any, asyncio.Task] = {}
+        self.cancelled_calls = set()
+    
+    def progress_reporter(self, params: Dict[str, Any]) -> Optional[ProgressCallback]:
+        """Progress callback for a tool call, or None if the client didn't ask for progress"""
+        meta = params.get('_meta') if isinstance(params.get('_meta'), dict) else {}
+        token = meta.get('progressToken')
+        if token is None or self.notify is None:
+            return None
+        
+        async def report(progress: float, total: Optional[float] = None, message: Optional[str] = None):
+            notification_params = {"progressToken": token, "progress": progress}
+            if total is not None:
+                notification_params["total"] = total
+            if message:
+                notification_params["message"] = message
+            try:
+                await self.notify({"jsonrpc": "2.0", "method": "notifications/progress",
+                                   "params": notification_params})
+            except Exception as e:
+                # A client that went away shouldn't fail the publish itself
+                logging.warning(f"Could not send progress notification: {e}")
+        return report
+    
+    def cancel_call(self, request_id: Any):
+        """Cancel an in-flight tools/call (notifications/cancelled); no response is sent for it"""
+        task = self.calls.get(request_id)
+        if task is not None and not task.done():
+            self.cancelled_calls.add(request_id)
+            task.cancel()
+    
+    async def handle_request(self, request: Any) -> Optional[Any]:
+        """Handle a JSON-RPC request or batch; returns None when nothing should be sent back"""
+        if not isinstance(request, list):
+            return await self.handle_message(request)
+        if not request:
+            return invalid_request("Empty batch")
+        
+        # Batch elements run concurrently; notifications get no entry in the response array
+        limit = asyncio.Semaphore(MAX_IN_FLIGHT)
+        async def handle_element(message):
+            async with limit:
+                return await self.handle_message(message)
+        responses = await asyncio.gather(*(handle_element(message) for message in request))
+        return [response for response in responses if response is not None] or None
+    
+    async def handle_message(self, request: Any) -> Optional[Dict[str, Any]]:
+        """Handle a single JSON-RPC request"""
+        if not isinstance(request, dict):
+            return invalid_request("Request must be an object")
+        
+        if request.get('method') == 'notifications/cancelled':
+            self.cancel_call((request.get('params') or {}).get('requestId'))
+            return None
+        
+        response = await self.dispatch_message(request)
+        # Notifications (no id) never get a response, not even an error
+        return response if 'id' in request else None
     
-    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle JSON-RPC request"""
+    async def dispatch_message(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
             method = request.get('method')
             params = request.get('params', {})
@@ -146,30 +192,35 @@ class SimpleMCPServer:
                 }
             
             elif method == 'tools/list':
-                tools_list = []
-                for name, tool_info in self.tools.items():
-                    tools_list.append({
-                        "name": name,
-                        "description": tool_info["description"],
-                        "inputSchema": tool_info["inputSchema"]
-                    })
-                
                 return {
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
-                        "tools": tools_list
+                        "tools": self.tools_list
                     }
                 }
             
             elif method == 'tools/call':
                 tool_name = params.get('name')
                 arguments = params.get('arguments', {})
+                on_progress = self.progress_reporter(params)
                 
-                if tool_name not in self.tools:
-                    raise Exception(f"Unknown tool: {tool_name}")
-                
-                result = await self.execute_tool(tool_name, arguments)
+                # The call runs as its own task so notifications/cancelled can stop just this call
+                call = asyncio.ensure_future(self.tool_cache.call(
+                    tool_name, arguments, lambda: self.execute_tool(tool_name, arguments, on_progress)
+                ))
+                self.calls[request_id] = call
+                try:
+                    result = await call
+                except asyncio.CancelledError:
+                    if request_id not in self.cancelled_calls:
+                        raise
+                    # The client cancelled this request and expects no response
+                    return None
+                finally:
+                    if self.calls.get(request_id) is call:
+                        del self.calls[request_id]
+                    self.cancelled_calls.discard(request_id)
                 
                 return {
                     "jsonrpc": "2.0",
@@ -187,6 +238,15 @@ class SimpleMCPServer:
             else:
                 raise Exception(f"Unknown method: {method}")
                 
+        except ToolInputError as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": request.get('id'),
+                "error": {
+                    "code": -32602,
+                    "message": str(e)
+                }
+            }
         except Exception as e:
             return {
                 "jsonrpc": "2.0",
@@ -197,139 +257,53 @@ class SimpleMCPServer:
                 }
             }
     
-    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any],
+                           on_progress: Optional[ProgressCallback] = None) -> str:
         """Execute a tool and return the result"""
-        
-        if tool_name == "post_to_facebook_page":
-            page_id = arguments.get("page_id")
-            message = arguments.get("message")
-            link = arguments.get("link")
-            
-            data = {"message": message}
-            if link:
-                data["link"] = link
-            
-            result = await self.meta_api.make_api_request(f"{page_id}/feed", "POST", data)
-            return f"Successfully posted to Facebook page. Post ID: {result.get('id', 'Unknown')}"
-        
-        elif tool_name == "post_to_instagram":
-            instagram_account_id = arguments.get("instagram_account_id")
-            image_url = arguments.get("image_url")
-            caption = arguments.get("caption", "")
-            
-            # Create media container
-            container_data = {
-                "image_url": image_url,
-                "caption": caption
-            }
-            
-            container_result = await self.meta_api.make_api_request(
-                f"{instagram_account_id}/media", "POST", container_data
-            )
-            
-            creation_id = container_result.get("id")
-            
-            # Publish media
-            publish_data = {"creation_id": creation_id}
-            publish_result = await self.meta_api.make_api_request(
-                f"{instagram_account_id}/media_publish", "POST", publish_data
-            )
-            
-            return f"Successfully posted to Instagram. Media ID: {publish_result.get('id', 'Unknown')}"
-        
-        elif tool_name == "get_facebook_page_insights":
-            page_id = arguments.get("page_id")
-            metric = arguments.get("metric", "page_views")
-            period = arguments.get("period", "day")
-            
-            params = {
-                "metric": metric,
-                "period": period
-            }
-            
-            result = await self.meta_api.make_api_request(f"{page_id}/insights", "GET", params)
-            
-            insights_text = f"Facebook Page Insights for {page_id}:\n"
-            for data_point in result.get("data", []):
-                insights_text += f"- {data_point.get('name', 'Unknown')}: {data_point.get('values', [{}])[0].get('value', 'N/A')}\n"
-            
-            return insights_text
-        
-        elif tool_name == "get_instagram_insights":
-            instagram_account_id = arguments.get("instagram_account_id")
-            metric = arguments.get("metric", "impressions")
-            
-            params = {"metric": metric}
-            
-            result = await self.meta_api.make_api_request(f"{instagram_account_id}/insights", "GET", params)
-            
-            insights_text = f"Instagram Insights for {instagram_account_id}:\n"
-            for data_point in result.get("data", []):
-                insights_text += f"- {data_point.get('name', 'Unknown')}: {data_point.get('values', [{}])[0].get('value', 'N/A')}\n"
-            
-            return insights_text
-        
-        elif tool_name == "generate_content_ideas":
-            topic = arguments.get("topic")
-            platform = arguments.get("platform", "both")
-            count = arguments.get("count", 5)
-            
-            base_ideas = [
-                f"Share a behind-the-scenes look at {topic}",
-                f"Create a tutorial about {topic}",
-                f"Ask your audience a question about {topic}",
-                f"Share tips and tricks related to {topic}",
-                f"Post inspirational quotes about {topic}",
-                f"Share user-generated content about {topic}",
-                f"Create a poll about {topic}",
-                f"Share industry news related to {topic}",
-                f"Post a carousel of {topic} facts",
-                f"Create a before/after post about {topic}"
-            ]
-            
-            platform_specific = {
-                "facebook": " (optimize with longer text and links)",
-                "instagram": " (use high-quality visuals and hashtags)",
-                "both": " (adapt format for each platform)"
-            }
-            
-            ideas = []
-            for i in range(min(count, len(base_ideas))):
-                ideas.append(base_ideas[i] + platform_specific[platform])
-            
-            ideas_text = f"Content Ideas for '{topic}' ({platform}):\n"
-            for i, idea in enumerate(ideas, 1):
-                ideas_text += f"{i}. {idea}\n"
-            
-            return ideas_text
-        
-        elif tool_name == "get_pages":
-            result = await self.meta_api.make_api_request("me/accounts", "GET")
-            
-            pages_text = "Your Facebook Pages:\n"
-            for page in result.get("data", []):
-                pages_text += f"- {page.get('name', 'Unknown')} (ID: {page.get('id', 'Unknown')})\n"
-            
-            return pages_text
-        
-        else:
-            raise Exception(f"Tool not implemented: {tool_name}")
+        context = ToolContext(self.meta_api, self.instagram_publisher, self.tool_cache, on_progress=on_progress)
+        return await registry.call(tool_name, arguments, context)
 
 async def main():
     """Main function to run the simplified MCP server"""
     server = SimpleMCPServer()
     
+    # Each request runs as its own task so a slow tool call doesn't hold up the rest;
+    # reading stops while MAX_IN_FLIGHT requests are still running, but notifications
+    # (cancellations in particular) are handled as they arrive
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+    tasks = set()
+    
     # Read from stdin and write to stdout (MCP protocol)
+    stdio = await StdioTransport.open()
+    server.notify = stdio.write_message
+    
+    async def dispatch(request: Dict[str, Any]):
+        try:
+            # Responses go out in completion order, one whole line at a time
+            response = await server.handle_request(request)
+            if response is not None:
+                await stdio.write_message(response)
+        finally:
+            in_flight.release()
+    
     while True:
         try:
-            line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-            if not line:
+            line = await stdio.read_line()
+            if line is None:
                 break
+            if not line.strip():
+                continue
             
-            request = json.loads(line.strip())
-            response = await server.handle_request(request)
+            request = json.loads(line)
+            notification = isinstance(request, dict) and 'id' not in request
+            if notification and str(request.get('method', '')).startswith('notifications/'):
+                await server.handle_request(request)
+                continue
             
-            print(json.dumps(response), flush=True)
+            await in_flight.acquire()
+            task = asyncio.ensure_future(dispatch(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
             
         except json.JSONDecodeError:
             continue
@@ -342,8 +316,12 @@ async def main():
                     "message": f"Parse error: {str(e)}"
                 }
             }
-            print(json.dumps(error_response), flush=True)
+            await stdio.write_message(error_response)
     
+    # Finish requests that were already read before shutting down
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await stdio.close()
     await server.meta_api.close_session()
 
 if __name__ == "__main__":
@@ -273,6 +273,34 @@ function disableForm(formId) {
     }
 }
 
+// Streaming helpers
+async function readEventStream(response, onEvent) {
+    // Read a text/event-stream response, calling onEvent(event, data) for each frame
+    var reader = response.body.getReader();
+    var decoder = new TextDecoder();
+    var buffer = '';
+    
+    while (true) {
+        var chunk = await reader.read();
+        if (chunk.done) break;
+        buffer += decoder.decode(chunk.value, { stream: true });
+        
+        var boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            var frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            var event = 'message';
+            var data = '';
+            frame.split('\n').forEach(function(line) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
 // Analytics helpers
 function createChart(canvas, data, options = {}) {
     // Placeholder for chart creation
@@ -293,5 +321,6 @@ window.MetaApp = {
     resetForm,
     enableForm,
     disableForm,
+    readEventStream,
     createChart
 };
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Newline-delimited JSON-RPC transport over the process's stdin/stdout
+"""
+import os
+import sys
+import json
+import stat
+import asyncio
+import logging
+from typing import Any, Optional
+
+# Bytes buffered from stdin before the pipe is paused; longer lines are still read whole
+STDIO_BUFFER_LIMIT = int(os.getenv('MCP_STDIO_BUFFER_LIMIT', str(1024 * 1024)))
+
+
+def is_pipe(stream) -> bool:
+    """True if the stream can be attached to the event loop (pipe, socket or tty)"""
+    try:
+        mode = os.fstat(stream.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode)
+
+
+class StdioTransport:
+    """stdin/stdout connected to the event loop as asyncio streams.
+
+    Reads and writes happen on the loop itself instead of a thread-pool hop
+    per message. The reader pauses the pipe once its buffer is full and
+    writes wait on drain(), so a slow peer applies backpressure both ways.
+    Either side falls back to blocking I/O when it isn't a pipe (redirected
+    files, Windows consoles) or when MCP_STDIO_TRANSPORT=thread.
+    """
+
+    def __init__(self, reader: Optional[asyncio.StreamReader] = None,
+                 writer: Optional[asyncio.StreamWriter] = None):
+        self.reader = reader
+        self.writer = writer
+        self._write_lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls) -> 'StdioTransport':
+        if os.getenv('MCP_STDIO_TRANSPORT', 'stream').lower() == 'thread':
+            return cls()
+
+        loop = asyncio.get_running_loop()
+        reader = writer = None
+        try:
+            if is_pipe(sys.stdin):
+                reader = asyncio.StreamReader(limit=STDIO_BUFFER_LIMIT)
+                await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+            if is_pipe(sys.stdout):
+                transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+                writer = asyncio.StreamWriter(transport, protocol, None, loop)
+        except (OSError, NotImplementedError, ValueError) as e:
+            logging.warning(f"Using blocking stdio: {e}")
+        return cls(reader, writer)
+
+    async def read_line(self) -> Optional[bytes]:
+        """Next line without its terminator, or None at EOF; lines may exceed the buffer limit"""
+        if self.reader is None:
+            line = await asyncio.get_running_loop().run_in_executor(None, sys.stdin.buffer.readline)
+            return line.rstrip(b'\r\n') if line else None
+
+        chunks = []
+        while True:
+            try:
+                chunks.append(await self.reader.readuntil(b'\n'))
+                break
+            except asyncio.LimitOverrunError as e:
+                # No newline in the buffered bytes yet: take them and keep reading
+                chunks.append(await self.reader.readexactly(e.consumed))
+            except asyncio.IncompleteReadError as e:
+                if not e.partial and not chunks:
+                    return None
+                chunks.append(e.partial)
+                break
+        return b''.join(chunks).rstrip(b'\r\n')
+
+    async def write_message(self, message: Any):
+        """Write one message as a single line, serialized with other writers"""
+        data = json.dumps(message).encode('utf-8') + b'\n'
+        async with self._write_lock:
+            if self.writer is None:
+                sys.stdout.buffer.write(data)
+                sys.stdout.buffer.flush()
+            else:
+                self.writer.write(data)
+                await self.writer.drain()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
@@ -5,6 +5,7 @@ import os
 from supabase import create_client, Client
 from typing import Optional, Dict, List, Any
 import logging
+from resilience import call_with_retry, breakers
 
 class SupabaseManager:
     def __init__(self):
@@ -26,23 +27,29 @@ class SupabaseManager:
         """Check if Supabase is available and configured"""
         return self.client is not None
     
+    def _execute(self, query, idempotent: bool = True):
+        """Execute a query, retrying transient network errors"""
+        return call_with_retry(query.execute, breaker=breakers['supabase'], idempotent=idempotent)
+    
     # Business Profile Methods
-    def get_business_profile(self, business_id: Optional[str] = None) -> Dict[str, Any]:
-        """Get business profile by ID or get the first one"""
+    def get_business_profile(self, business_id: Optional[str] = None, strict: bool = False) -> Dict[str, Any]:
+        """Get business profile by ID or get the first one (strict: raise query errors instead of returning {})"""
         if not self.is_available():
             return {}
         
         try:
             if business_id:
-                response = self.client.table('business_profiles').select('*').eq('id', business_id).execute()
+                response = self._execute(self.client.table('business_profiles').select('*').eq('id', business_id))
             else:
                 # Get the first business profile (for single-business use)
-                response = self.client.table('business_profiles').select('*').limit(1).execute()
+                response = self._execute(self.client.table('business_profiles').select('*').limit(1))
             
             if response.data:
                 return response.data[0]
             return {}
         except Exception as e:
+            if strict:
+                raise
             logging.error(f"Error getting business profile: {e}")
             return {}
     
@@ -57,11 +64,11 @@ class SupabaseManager:
             
             if existing:
                 # Update existing profile
-                response = self.client.table('business_profiles').update(profile_data).eq('id', existing['id']).execute()
+                response = self._execute(self.client.table('business_profiles').update(profile_data).eq('id', existing['id']))
                 return existing['id']
             else:
                 # Create new profile
-                response = self.client.table('business_profiles').insert(profile_data).execute()
+                response = self._execute(self.client.table('business_profiles').insert(profile_data), idempotent=False)
                 if response.data:
                     return response.data[0]['id']
             return None
@@ -70,8 +77,9 @@ class SupabaseManager:
             return None
     
     # Content Library Methods
-    def get_content_library(self, business_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get content library items"""
+    def get_content_library(self, business_id: Optional[str] = None, limit: int = 50,
+                            strict: bool = False) -> List[Dict[str, Any]]:
+        """Get content library items (strict: raise query errors instead of returning [])"""
         if not self.is_available():
             return []
         
@@ -81,9 +89,11 @@ class SupabaseManager:
             if business_id:
                 query = query.eq('business_id', business_id)
             
-            response = query.execute()
+            response = self._execute(query)
             return response.data or []
         except Exception as e:
+            if strict:
+                raise
             logging.error(f"Error getting content library: {e}")
             return []
     
@@ -101,7 +111,7 @@ class SupabaseManager:
             if business_id:
                 content_data['business_id'] = business_id
             
-            response = self.client.table('content_library').insert(content_data).execute()
+            response = self._execute(self.client.table('content_library').insert(content_data), idempotent=False)
             if response.data:
                 return response.data[0]['id']
             return None
@@ -124,7 +134,7 @@ class SupabaseManager:
             if category:
                 query = query.eq('category', category)
             
-            response = query.execute()
+            response = self._execute(query)
             return response.data or []
         except Exception as e:
             logging.error(f"Error getting training images: {e}")
@@ -144,7 +154,7 @@ class SupabaseManager:
             if business_id:
                 image_data['business_id'] = business_id
             
-            response = self.client.table('training_images').insert(image_data).execute()
+            response = self._execute(self.client.table('training_images').insert(image_data), idempotent=False)
             if response.data:
                 return response.data[0]['id']
             return None
@@ -159,7 +169,10 @@ class SupabaseManager:
         
         try:
             # Upload to storage bucket
-            response = self.client.storage.from_('training-images').upload(
+            response = call_with_retry(
+                self.client.storage.from_('training-images').upload,
+                breaker=breakers['supabase'],
+                idempotent=False,
                 path=filename,
                 file=file_data,
                 file_options={'content-type': content_type}
@@ -217,7 +230,7 @@ class SupabaseManager:
             if business_id:
                 knowledge_data['business_id'] = business_id
             
-            response = self.client.table('claude_knowledge').insert(knowledge_data).execute()
+            response = self._execute(self.client.table('claude_knowledge').insert(knowledge_data), idempotent=False)
             if response.data:
                 return response.data[0]['id']
             return None
@@ -225,8 +238,9 @@ class SupabaseManager:
             logging.error(f"Error saving Claude knowledge: {e}")
             return None
     
-    def get_claude_knowledge(self, category: Optional[str] = None, business_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get Claude knowledge items"""
+    def get_claude_knowledge(self, category: Optional[str] = None, business_id: Optional[str] = None,
+                             strict: bool = False) -> List[Dict[str, Any]]:
+        """Get Claude knowledge items (strict: raise query errors instead of returning [])"""
         if not self.is_available():
             return []
         
@@ -239,9 +253,11 @@ class SupabaseManager:
             if category:
                 query = query.eq('category', category)
             
-            response = query.execute()
+            response = self._execute(query)
             return response.data or []
         except Exception as e:
+            if strict:
+                raise
             logging.error(f"Error getting Claude knowledge: {e}")
             return []
     
@@ -251,7 +267,7 @@ class SupabaseManager:
             return None
         
         try:
-            response = self.client.table('claude_knowledge').select('*').eq('id', knowledge_id).execute()
+            response = self._execute(self.client.table('claude_knowledge').select('*').eq('id', knowledge_id))
             if response.data:
                 return response.data[0]
             return None
@@ -67,4 +67,71 @@ CREATE POLICY "Allow all access to claude_knowledge" ON claude_knowledge FOR ALL
 INSERT INTO storage.buckets (id, name, public) VALUES ('training-images', 'training-images', true);
 
 -- 8. Storage policy for images
-CREATE POLICY "Allow all access to training images bucket" ON storage.objects FOR ALL USING (bucket_id = 'training-images');
\ No newline at end of file
+CREATE POLICY "Allow all access to training images bucket" ON storage.objects FOR ALL USING (bucket_id = 'training-images');
+
+-- 9. Scheduled posts outbox (published by outbox_worker.py)
+CREATE TABLE scheduled_posts (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    platform TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    scheduled_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    locked_by TEXT,
+    locked_until TIMESTAMP WITH TIME ZONE,
+    result_id TEXT,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX scheduled_posts_due_idx ON scheduled_posts (status, scheduled_at);
+
+ALTER TABLE scheduled_posts ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all access to scheduled_posts" ON scheduled_posts FOR ALL USING (true);
+
+-- 10. Lease due posts to a worker; SKIP LOCKED lets several workers claim batches in parallel.
+-- Workers renew their leases while publishing, so an expired lease means the worker died mid-batch and the
+-- post may already be live: it is failed for review instead of being published again.
+CREATE OR REPLACE FUNCTION claim_scheduled_posts(batch_size INTEGER, worker TEXT, lease_seconds INTEGER,
+                                                 max_attempts INTEGER DEFAULT 3,
+                                                 expired_error TEXT DEFAULT 'Worker lease expired while publishing')
+RETURNS SETOF scheduled_posts AS $$
+    UPDATE scheduled_posts
+    SET status = 'failed',
+        error = expired_error,
+        locked_by = NULL,
+        locked_until = NULL,
+        updated_at = NOW()
+    WHERE status = 'processing' AND locked_until < NOW();
+
+    UPDATE scheduled_posts
+    SET status = 'processing',
+        locked_by = worker,
+        locked_until = NOW() + make_interval(secs => lease_seconds),
+        attempts = attempts + 1,
+        updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM scheduled_posts
+        WHERE status = 'pending' AND scheduled_at <= NOW() AND attempts < max_attempts
+        ORDER BY scheduled_at
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- 11. Cached OpenAI generations (GENERATION_CACHE_BACKEND=supabase)
+CREATE TABLE generation_cache (
+    cache_key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX generation_cache_expires_idx ON generation_cache (expires_at);
+
+ALTER TABLE generation_cache ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Allow all access to generation_cache" ON generation_cache FOR ALL USING (true);
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Tests for Graph edge pagination"""
+
+from graph_paging import iter_edge
+
+DAY = 86400
+
+def fake_insights(requests):
+    """An insights edge with one value per day that always offers a `next` window, as Graph does"""
+    def request(endpoint, method, params):
+        requests.append(dict(params))
+        since, until = int(params['since']), int(params['until'])
+        values = [{'value': day, 'end_time': day} for day in range(since, until, DAY)]
+        next_url = f"https://graph.facebook.com/v18.0/{endpoint}?since={until}&until={until + (until - since)}&access_token=t"
+        return {'data': [{'name': 'page_views', 'period': 'day', 'values': values}],
+                'paging': {'next': next_url}}
+    return request
+
+def test_bounded_window_stops_at_until():
+    """An explicit since/until query must not keep paging towards today"""
+    since = 1700000000
+    until = since + 3 * DAY
+    requests = []
+    rows = list(iter_edge(fake_insights(requests), 'page/insights', params={'since': since, 'until': until}))
+
+    assert len(requests) == 1, requests
+    assert all(since <= value['end_time'] < until for row in rows for value in row['values'])
+    print("Bounded window fetched in one request")
+
+def test_iso_until_is_honoured():
+    """Graph also accepts dates for until; paging stops there too"""
+    requests = []
+    params = {'since': '1704067200', 'until': '2024-01-03'}
+    request = fake_insights(requests)
+
+    def dated_request(endpoint, method, query):
+        # The first page resolves the date the way Graph does
+        if query['until'] == '2024-01-03':
+            query = dict(query, until='1704240000')
+        return request(endpoint, method, query)
+
+    list(iter_edge(dated_request, 'page/insights', params=params))
+    assert len(requests) == 1, requests
+    print("ISO until honoured")
+
+if __name__ == "__main__":
+    test_bounded_window_stops_at_until()
+    test_iso_until_is_honoured()
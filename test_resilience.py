@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Tests for the circuit breaker and retry helpers"""
+
+import asyncio
+import time
+from resilience import CircuitBreaker, CircuitOpenError, acall_with_retry
+
+async def test_cancelled_probe_releases_breaker():
+    """A half-open probe that gets cancelled must not leave the circuit shut for good"""
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    
+    async def slow_call():
+        await asyncio.sleep(10)
+    
+    probe = asyncio.ensure_future(acall_with_retry(slow_call, breaker=breaker))
+    await asyncio.sleep(0.01)
+    # While the probe is running, other calls still fail fast
+    try:
+        breaker.before_call()
+        raise AssertionError("second call admitted while the probe was in flight")
+    except CircuitOpenError:
+        pass
+    
+    probe.cancel()
+    try:
+        await probe
+    except asyncio.CancelledError:
+        pass
+    
+    # The next call is admitted as a new probe, and its success closes the circuit
+    async def ok_call():
+        return 'ok'
+    assert await acall_with_retry(ok_call, breaker=breaker) == 'ok'
+    assert breaker.state == 'closed'
+    print("Cancelled probe released the breaker")
+
+if __name__ == "__main__":
+    asyncio.run(test_cancelled_probe_releases_breaker())
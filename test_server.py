@@ -51,8 +51,61 @@ async def test_server():
     
     response = await server.handle_request(content_request)
     print(f"Content ideas response: {json.dumps(response, indent=2)}")
-    
+
+    # Test batch (the notification gets no response)
+    print("\nTesting batch...")
+    batch_request = [
+        {"jsonrpc": "2.0", "id": 4, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 5, "method": "tools/list", "params": {}}
+    ]
+
+    response = await server.handle_request(batch_request)
+    assert [item["id"] for item in response] == [4, 5], response
+    print(f"Batch response ids: {[item['id'] for item in response]}")
+
     await server.meta_api.close_session()
 
+async def test_cancel_while_busy():
+    """notifications/cancelled must be read even when every in-flight slot is taken"""
+    import simple_server
+    
+    lines = [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "slow_tool", "arguments": {}}},
+        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 1}},
+    ]
+    sent = []
+    
+    class FakeStdio:
+        @classmethod
+        async def open(cls):
+            return cls()
+        
+        async def read_line(self):
+            await asyncio.sleep(0.05)
+            return json.dumps(lines.pop(0)).encode() if lines else None
+        
+        async def write_message(self, message):
+            sent.append(message)
+        
+        async def close(self):
+            pass
+    
+    async def slow_tool(self, tool_name, arguments, on_progress=None):
+        await asyncio.sleep(10)
+        return {"done": True}
+    
+    saved = (simple_server.StdioTransport, simple_server.MAX_IN_FLIGHT, SimpleMCPServer.execute_tool)
+    simple_server.StdioTransport, simple_server.MAX_IN_FLIGHT, SimpleMCPServer.execute_tool = FakeStdio, 1, slow_tool
+    try:
+        await asyncio.wait_for(simple_server.main(), 2)
+    finally:
+        simple_server.StdioTransport, simple_server.MAX_IN_FLIGHT, SimpleMCPServer.execute_tool = saved
+    
+    # The cancelled call gets no response at all
+    assert sent == [], sent
+    print("Cancellation handled while the server was at its in-flight limit")
+
 if __name__ == "__main__":
-    asyncio.run(test_server())
\ No newline at end of file
+    asyncio.run(test_server())
+    asyncio.run(test_cancel_while_busy())
\ No newline at end of file
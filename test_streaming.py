@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests for the streamed smart post response"""
+
+import json
+import concurrent.futures
+import app
+
+def parse_events(frames):
+    events = []
+    for frame in frames:
+        lines = frame.strip().split('\n')
+        events.append((lines[0][len('event: '):], json.loads(lines[1][len('data: '):])))
+    return events
+
+def test_failed_image_reported_once():
+    """An image that fails while the copy is streaming is sent once and marked partial once"""
+    image_future = concurrent.futures.Future()
+    image_future.set_exception(RuntimeError("DALL-E unavailable"))
+    post = {
+        'platform': 'instagram',
+        'post_type': 'general',
+        'image_prompt': 'squats, realistic style',
+        'image_future': image_future,
+        'partial': [],
+        'regenerate': True,
+        'completion': {'model': 'test', 'messages': []}
+    }
+
+    saved = (app.create_chat_completion, app.iter_deltas)
+    app.create_chat_completion = lambda **kwargs: None
+    app.iter_deltas = lambda stream: iter(["COPY:\nLeg day ", "done right.\n", "HASHTAGS:\n#legday"])
+    try:
+        events = parse_events(app.stream_smart_post(post))
+    finally:
+        app.create_chat_completion, app.iter_deltas = saved
+
+    names = [name for name, _ in events]
+    assert names.count('image') == 1, names
+    assert dict(events)['image'] == {'image_error': 'DALL-E unavailable'}
+    done = events[-1]
+    assert done[0] == 'done', names
+    assert done[1]['partial'] == ['image'], done[1]
+    assert done[1]['image_error'] == 'DALL-E unavailable'
+    print("Failed image reported once")
+
+if __name__ == "__main__":
+    test_failed_image_reported_once()
@@ -0,0 +1,143 @@
+"""
+TTL/LRU response cache for read-only MCP tools
+"""
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from graph_batch import as_list
+
+# Read-only tools that may be served from the cache, and the objects each result depends on
+READ_TOOL_TAGS: Dict[str, Callable[[Dict[str, Any]], List[str]]] = {
+    'get_pages': lambda args: ['me/accounts'],
+    'get_facebook_page_insights': lambda args: [args.get('page_id')],
+    'get_instagram_insights': lambda args: [args.get('instagram_account_id')],
+    'get_insights_many': lambda args: as_list(args.get('object_ids')),
+}
+
+# Write tools, and the objects whose cached results they make stale
+WRITE_TOOL_TAGS: Dict[str, Callable[[Dict[str, Any]], List[str]]] = {
+    'post_to_facebook_page': lambda args: [args.get('page_id')],
+    'post_to_instagram': lambda args: [args.get('instagram_account_id')],
+    'post_many': lambda args: [
+        post.get('page_id') or post.get('instagram_account_id')
+        for post in args.get('posts') or [] if isinstance(post, dict)
+    ],
+}
+
+
+class LeaderCancelled(Exception):
+    """Set on a coalesced call's future when the call that was running it got cancelled"""
+
+
+def cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Tool name plus arguments in canonical form (sorted keys, unset values dropped)"""
+    normalized = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in arguments.items() if value is not None
+    }
+    return f"{tool_name}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+class ToolCache:
+    """Caches read-only tool results, coalesces identical in-flight calls and
+    drops results for an object as soon as a write tool touches it.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('MCP_CACHE_TTL', '60'))
+        self.max_entries = max_entries or int(os.getenv('MCP_CACHE_MAX_ENTRIES', '256'))
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Bumped on every invalidation so results fetched before a write are never stored
+        self._generation = 0
+        self._invalidated_at: Dict[str, int] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'invalidations': 0}
+
+    async def call(self, tool_name: str, arguments: Dict[str, Any],
+                   func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a tool call through the cache"""
+        if tool_name in WRITE_TOOL_TAGS:
+            try:
+                return await func()
+            finally:
+                # Even a failed write may have partly succeeded (e.g. post_many)
+                self.invalidate(WRITE_TOOL_TAGS[tool_name](arguments))
+        if tool_name not in READ_TOOL_TAGS or self.ttl <= 0:
+            return await func()
+
+        key = cache_key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry and entry['expires_at'] > time.monotonic():
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry['value']
+
+        pending = self._pending.get(key)
+        if pending:
+            self._stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(pending)
+            except LeaderCancelled:
+                # The caller we were waiting on timed out or went away; this call is still wanted
+                return await self.call(tool_name, arguments, func)
+
+        self._stats['misses'] += 1
+        tags = [tag for tag in READ_TOOL_TAGS[tool_name](arguments) if tag]
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            # Waiters must not inherit this caller's cancellation: they re-run the call instead
+            future.set_exception(LeaderCancelled(f"{tool_name} call was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            del self._pending[key]
+
+        future.set_result(value)
+        if all(self._invalidated_at.get(tag, -1) <= generation for tag in tags):
+            self._store(key, value, tags)
+        return value
+
+    def _store(self, key: str, value: Any, tags: List[str]):
+        self._entries[key] = {'value': value, 'tags': tags, 'expires_at': time.monotonic() + self.ttl}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, tags: List[str]):
+        """Drop every cached result that depends on one of the given objects"""
+        tags = {tag for tag in tags if tag}
+        if not tags:
+            return
+        self._generation += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self._generation
+        for key in [key for key, entry in self._entries.items() if tags.intersection(entry['tags'])]:
+            del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['coalesced'] + self._stats['misses']
+        return dict(
+            self._stats,
+            entries=len(self._entries),
+            in_flight=len(self._pending),
+            hit_ratio=round((self._stats['hits'] + self._stats['coalesced']) / lookups, 3) if lookups else None,
+            ttl=self.ttl,
+            max_entries=self.max_entries
+        )
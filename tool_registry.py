@@ -0,0 +1,254 @@
+"""
+Table-driven MCP tool registry: schemas, input validation, per-tool
+timeouts and concurrency limits, and per-tool latency/error statistics
+"""
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Seconds a tool call may take (including time queued behind its concurrency limit)
+DEFAULT_TOOL_TIMEOUT = float(os.getenv('MCP_TOOL_TIMEOUT', '60'))
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls land in "+Inf"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+ToolFunc = Callable[[Any, Dict[str, Any]], Awaitable[str]]
+
+JSON_TYPES = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'array': (list,),
+    'object': (dict,),
+}
+
+
+class UnknownToolError(LookupError):
+    """No tool is registered under the requested name"""
+
+
+class ToolInputError(ValueError):
+    """Tool arguments don't match the tool's input schema"""
+
+
+class ToolTimeoutError(TimeoutError):
+    """A tool call ran past its timeout and was cancelled"""
+
+
+def check_value(schema: Dict[str, Any], value: Any, path: str):
+    """Check a value against the subset of JSON Schema the tool schemas use"""
+    expected = schema.get('type')
+    if expected in JSON_TYPES:
+        # bool is an int subclass, but true isn't a valid integer argument
+        if not isinstance(value, JSON_TYPES[expected]) or (isinstance(value, bool) and expected != 'boolean'):
+            raise ToolInputError(f"{path} must be of type {expected}")
+    if 'enum' in schema and value not in schema['enum']:
+        raise ToolInputError(f"{path} must be one of: {', '.join(map(str, schema['enum']))}")
+
+    if expected == 'array':
+        if 'maxItems' in schema and len(value) > schema['maxItems']:
+            raise ToolInputError(f"{path} has more than {schema['maxItems']} items")
+        if 'minItems' in schema and len(value) < schema['minItems']:
+            raise ToolInputError(f"{path} needs at least {schema['minItems']} items")
+        for index, item in enumerate(value):
+            check_value(schema.get('items') or {}, item, f"{path}[{index}]")
+    elif expected == 'object':
+        check_object(schema, value, path)
+
+
+def check_object(schema: Dict[str, Any], value: Dict[str, Any], path: str):
+    for name in schema.get('required') or []:
+        if value.get(name) is None:
+            raise ToolInputError(f"{path}.{name} is required" if path else f"{name} is required")
+    properties = schema.get('properties') or {}
+    for name, item in value.items():
+        if name in properties and item is not None:
+            check_value(properties[name], item, f"{path}.{name}" if path else name)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are reported as bucket upper bounds"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + ['+Inf']
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {label: count for label, count in zip(labels, self.counts) if count}
+        }
+
+
+class ToolSpec:
+    """One registered tool: its schema, handler, limits and statistics"""
+
+    def __init__(self, name: str, description: str, input_schema: Dict[str, Any], func: ToolFunc,
+                 timeout: Optional[float] = None, concurrency: Optional[int] = None):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.func = func
+        self.timeout = timeout if timeout is not None else DEFAULT_TOOL_TIMEOUT
+        self.concurrency = concurrency
+        self.latency = LatencyHistogram()
+        self.counters = {'calls': 0, 'errors': 0, 'timeouts': 0, 'cancelled': 0, 'invalid': 0,
+                         'in_flight': 0, 'queued': 0}
+        # Semaphores are created per event loop on first use (a loop may not exist at import time)
+        self._limits: Dict[int, asyncio.Semaphore] = {}
+
+    def definition(self) -> Dict[str, Any]:
+        return {'name': self.name, 'description': self.description, 'inputSchema': self.input_schema}
+
+    def validate(self, arguments: Any) -> Dict[str, Any]:
+        """Checked arguments with schema defaults filled in"""
+        if arguments is None:
+            arguments = {}
+        if not isinstance(arguments, dict):
+            self.counters['invalid'] += 1
+            raise ToolInputError(f"Invalid arguments for {self.name}: arguments must be an object")
+        try:
+            check_object(self.input_schema, arguments, '')
+        except ToolInputError as e:
+            self.counters['invalid'] += 1
+            raise ToolInputError(f"Invalid arguments for {self.name}: {e}") from None
+
+        defaults = {
+            name: prop['default'] for name, prop in (self.input_schema.get('properties') or {}).items()
+            if 'default' in prop and arguments.get(name) is None
+        }
+        return dict(arguments, **defaults) if defaults else arguments
+
+    def _limit(self) -> Optional[asyncio.Semaphore]:
+        if not self.concurrency:
+            return None
+        loop_id = id(asyncio.get_running_loop())
+        if loop_id not in self._limits:
+            self._limits[loop_id] = asyncio.Semaphore(self.concurrency)
+        return self._limits[loop_id]
+
+    async def _run_limited(self, context: Any, arguments: Dict[str, Any]) -> str:
+        limit = self._limit()
+        if limit is None:
+            return await self.func(context, arguments)
+        self.counters['queued'] += 1
+        try:
+            await limit.acquire()
+        finally:
+            self.counters['queued'] -= 1
+        try:
+            return await self.func(context, arguments)
+        finally:
+            limit.release()
+
+    async def run(self, context: Any, arguments: Dict[str, Any]) -> str:
+        """Run the tool under its concurrency limit and timeout, recording latency and outcome"""
+        self.counters['calls'] += 1
+        self.counters['in_flight'] += 1
+        started = time.perf_counter()
+        try:
+            if self.timeout:
+                return await asyncio.wait_for(self._run_limited(context, arguments), self.timeout)
+            return await self._run_limited(context, arguments)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise ToolTimeoutError(f"{self.name} timed out after {self.timeout:g}s") from None
+        except asyncio.CancelledError:
+            self.counters['cancelled'] += 1
+            raise
+        except Exception:
+            self.counters['errors'] += 1
+            raise
+        finally:
+            self.counters['in_flight'] -= 1
+            self.latency.observe((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.counters['calls']
+        failures = self.counters['errors'] + self.counters['timeouts']
+        return dict(
+            self.counters,
+            error_ratio=round(failures / calls, 3) if calls else None,
+            timeout_s=self.timeout,
+            concurrency=self.concurrency,
+            latency=self.latency.snapshot()
+        )
+
+
+class ToolRegistry:
+    """Tools by name, registered with the @registry.tool(...) decorator.
+
+    Both MCP servers list and dispatch through the same registry, so a tool
+    is defined once. Handlers take (context, arguments) and return the text
+    result; the context carries whatever the transport provides (Graph
+    client, publisher, progress callback).
+    """
+
+    def __init__(self):
+        self.tools: Dict[str, ToolSpec] = {}
+        self._definitions: Optional[List[Dict[str, Any]]] = None
+
+    def tool(self, name: str, description: str, input_schema: Dict[str, Any],
+             timeout: Optional[float] = None, concurrency: Optional[int] = None) -> Callable[[ToolFunc], ToolFunc]:
+        """Register the decorated coroutine function as a tool"""
+        def decorator(func: ToolFunc) -> ToolFunc:
+            if name in self.tools:
+                raise ValueError(f"Tool already registered: {name}")
+            self.tools[name] = ToolSpec(name, description, input_schema, func, timeout, concurrency)
+            self._definitions = None
+            return func
+        return decorator
+
+    def get(self, name: str) -> ToolSpec:
+        try:
+            return self.tools[name]
+        except (KeyError, TypeError):
+            raise UnknownToolError(f"Unknown tool: {name}") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """tools/list payload, built once"""
+        if self._definitions is None:
+            self._definitions = [spec.definition() for spec in self.tools.values()]
+        return self._definitions
+
+    async def call(self, name: str, arguments: Any, context: Any = None) -> str:
+        """Validate the arguments and run the named tool"""
+        spec = self.get(name)
+        return await spec.run(context, spec.validate(arguments))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tool call counts, error counts and latency histograms"""
+        return {name: spec.stats() for name, spec in self.tools.items()}
@@ -0,0 +1,188 @@
+"""
+Compiled, versioned training context (business profile, content examples
+and knowledge) for the generation prompts
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from knowledge_index import KnowledgeIndex
+
+# Safety net for other app instances: their save routes bump their own version, not ours
+MAX_CONTEXT_AGE = float(os.getenv('TRAINING_CONTEXT_MAX_AGE', '300'))
+
+DEFAULT_BUSINESS = 'default'
+
+
+def profile_section(profile: Dict[str, Any], business_name: str, target_audience: str, tone: str) -> str:
+    """Business Context section of the smart post prompt (form values fill gaps in the profile)"""
+    if not profile:
+        return ""
+    training_context = f"\nBusiness Context:\n"
+    training_context += f"- Business: {profile.get('business_name', business_name)}\n"
+    training_context += f"- Industry: {profile.get('industry', 'fitness')}\n"
+    training_context += f"- Target Audience: {profile.get('target_audience', target_audience)}\n"
+    training_context += f"- Brand Voice: {profile.get('brand_voice', tone)}\n"
+    training_context += f"- Services: {profile.get('services', '')}\n"
+    training_context += f"- USP: {profile.get('usp', '')}\n"
+    return training_context
+
+
+def examples_section(content_examples: List[Dict[str, Any]]) -> str:
+    """Successful Content Examples section of the smart post prompt"""
+    if not content_examples:
+        return ""
+    training_context = f"\nSuccessful Content Examples:\n"
+    for example in content_examples:
+        training_context += f"- {example.get('post_content', '')[:100]}...\n"
+    return training_context
+
+
+def chat_business_context(profile: Dict[str, Any]) -> str:
+    """Business Context block of the chat system prompt"""
+    business_context = ""
+    if profile:
+        business_context += f"Business: {profile.get('business_name', 'Gym Lead Hub')}\n"
+        business_context += f"Industry: {profile.get('industry', 'Gym Owner Coaching & Marketing')}\n"
+        business_context += f"Services: {profile.get('services', '')}\n"
+        business_context += f"Target Audience: {profile.get('target_audience', '')}\n"
+        business_context += f"Brand Voice: {profile.get('brand_voice', '')}\n"
+    return business_context
+
+
+class CompiledContext:
+    """Everything the prompts need from the training data, with the request-independent
+    prompt sections already rendered"""
+
+    def __init__(self, version: int, profile: Dict[str, Any], content_examples: List[Dict[str, Any]],
+                 knowledge: List[Dict[str, Any]]):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.profile = profile
+        self.content_examples = content_examples
+        self.knowledge = knowledge
+        self.examples_section = examples_section(content_examples)
+        self.chat_context = chat_business_context(profile)
+        self._knowledge_index: Optional[KnowledgeIndex] = None
+        self._index_lock = threading.Lock()
+
+    @property
+    def knowledge_index(self) -> KnowledgeIndex:
+        """BM25 index over the knowledge, built on first use (smart posts never need it)"""
+        with self._index_lock:
+            if self._knowledge_index is None:
+                self._knowledge_index = KnowledgeIndex(self.knowledge)
+            return self._knowledge_index
+
+    def adopt_index(self, previous: 'CompiledContext'):
+        """Start from a copy of a previous build's index, re-indexing only changed items (saves a full
+        rebuild on expiry). Only call this with a complete knowledge list: missing items are dropped."""
+        knowledge_index = previous._knowledge_index
+        if knowledge_index is None or not all(item.get('id') for item in self.knowledge):
+            return
+        knowledge_index = knowledge_index.synced(self.knowledge)
+        with self._index_lock:
+            self._knowledge_index = knowledge_index
+
+    def add_knowledge(self, item: Dict[str, Any]):
+        with self._index_lock:
+            self.knowledge = self.knowledge + [item]
+            if self._knowledge_index is not None:
+                self._knowledge_index.add(item)
+
+    def smart_post_context(self, business_name: str, target_audience: str, tone: str) -> str:
+        return profile_section(self.profile, business_name, target_audience, tone) + self.examples_section
+
+
+class TrainingContextCache:
+    """Compiled training context per business, rebuilt only after its version is bumped.
+
+    `load(business_id)` returns (profile, content_examples, knowledge). The
+    save routes call `bump()` whenever they change one of those, so requests
+    in between read the compiled context without touching the database.
+    New knowledge items go through `add_knowledge()` instead, which updates
+    the compiled context (and its search index) in place.
+    """
+
+    def __init__(self, load: Callable[[Optional[str]], tuple], max_age: Optional[float] = None):
+        self.load = load
+        self.max_age = max_age if max_age is not None else MAX_CONTEXT_AGE
+        self._versions: Dict[str, int] = {}
+        self._compiled: Dict[str, CompiledContext] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._stats = {'hits': 0, 'builds': 0, 'bumps': 0, 'build_errors': 0, 'knowledge_adds': 0}
+
+    def bump(self, business_id: Optional[str] = None):
+        """Mark a business's training data as changed"""
+        key = business_id or DEFAULT_BUSINESS
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._stats['bumps'] += 1
+
+    def add_knowledge(self, item: Dict[str, Any], business_id: Optional[str] = None):
+        """Add a saved knowledge item to the compiled context without rebuilding it"""
+        key = business_id or DEFAULT_BUSINESS
+        with self._lock:
+            compiled = self._fresh(key)
+            if compiled is None:
+                # Nothing current to update (or a build may be loading right now): rebuild on next use
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._stats['knowledge_adds'] += 1
+        if compiled is not None:
+            compiled.add_knowledge(item)
+
+    def _fresh(self, key: str) -> Optional[CompiledContext]:
+        compiled = self._compiled.get(key)
+        if compiled is None or compiled.version != self._versions.get(key, 0):
+            return None
+        if self.max_age and time.monotonic() - compiled.built_at > self.max_age:
+            return None
+        return compiled
+
+    def get(self, business_id: Optional[str] = None) -> CompiledContext:
+        """Compiled context for a business, building it on first use or after a change"""
+        key = business_id or DEFAULT_BUSINESS
+        with self._lock:
+            compiled = self._fresh(key)
+            if compiled:
+                self._stats['hits'] += 1
+                return compiled
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # One request rebuilds; the others wait for it instead of querying too
+        with build_lock:
+            with self._lock:
+                compiled = self._fresh(key)
+                if compiled:
+                    self._stats['hits'] += 1
+                    return compiled
+                version = self._versions.get(key, 0)
+            try:
+                profile, content_examples, knowledge = self.load(business_id)
+            except Exception as e:
+                with self._lock:
+                    self._stats['build_errors'] += 1
+                    stale = self._compiled.get(key)
+                if stale is None:
+                    raise
+                logging.warning(f"Serving previous training context after rebuild failed: {e}")
+                return stale
+            compiled = CompiledContext(version, profile or {}, content_examples or [], knowledge or [])
+            with self._lock:
+                previous = self._compiled.get(key)
+            # load() raises on query errors, so a successful load is the complete knowledge list
+            if previous is not None:
+                compiled.adopt_index(previous)
+            with self._lock:
+                self._compiled[key] = compiled
+                self._stats['builds'] += 1
+            return compiled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            knowledge_index = {key: compiled._knowledge_index.stats() for key, compiled in self._compiled.items()
+                               if compiled._knowledge_index is not None}
+            return dict(self._stats, versions=dict(self._versions), knowledge_index=knowledge_index)
@@ -5,7 +5,6 @@ A Flask-based web application for easy content creation and posting
 """
 
 import os
-import requests
 from flask import Flask, render_template, request, flash, redirect, url_for, jsonify
 from dotenv import load_dotenv
 import json
@@ -13,6 +12,8 @@ import json
 # Load environment variables
 load_dotenv()
 
+from http_client import http_client
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
 
@@ -32,7 +33,7 @@ class MetaAPI:
             data = None
         
         try:
-            response = requests.request(method, url, params=params, data=data)
+            response = http_client.request(method, url, params=params, data=data)
             result = response.json()
             if response.status_code >= 400:
                 raise Exception(f"Meta API Error: {result.get('error', {}).get('message', 'Unknown error')}")